@@ -0,0 +1 @@
+"""Замеры производительности базы данных (см. benchmarks/run.py)"""
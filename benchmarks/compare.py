@@ -0,0 +1,71 @@
+"""
+Сравнение двух результатов benchmarks.run:
+
+    python -m benchmarks.compare base.json new.json
+
+Для каждого замера печатает один главный показатель в обоих запусках:
+операций в секунду, а для пикового RSS (КБ) и размера на диске (байты) -
+само значение. Отношение приведено так, что больше 1 - лучше: для
+операций это новое к старому, для памяти и диска - старое к новому.
+"""
+import argparse
+import json
+
+
+def _load(filepath):
+    with open(filepath, encoding="utf-8") as file:
+        return json.load(file)
+
+def _rows(report):
+    """{(раздел, операция): сводка} по всем замерам отчета"""
+    startup = report.get("startup", {})
+    rows = {("startup", name): stats for name, stats in startup.items()}
+    rows.update(
+        {("parsers", name): stats for name, stats in report["parsers"].items()}
+    )
+    for case in report["cases"]:
+        section = f'{case["storage"]}/{case["size"]}'
+        for name, stats in case["operations"].items():
+            rows[(section, name)] = stats
+        rows[(section, "peak_rss_kb")] = {"value": case["peak_rss_kb"]}
+        rows[(section, "disk_bytes")] = {"value": case["disk_bytes"]}
+    return rows
+
+def _main_value(stats):
+    """Главный показатель сводки и признак "больше - лучше" """
+    if "ops_per_sec" in stats:
+        return stats["ops_per_sec"], True
+    if "seconds" in stats:
+        return stats["count"] / stats["seconds"], True
+    return stats["value"], False
+
+def compare(base, new):
+    """Строки сравнения двух отчетов"""
+    base_rows, new_rows = _rows(base), _rows(new)
+    lines = [f'{"замер":<36} {"было":>14} {"стало":>14} {"отношение":>10}']
+    for key in new_rows:
+        if key not in base_rows:
+            continue
+        old_value, higher_better = _main_value(base_rows[key])
+        new_value, _ = _main_value(new_rows[key])
+        ratio = new_value / old_value if old_value else float("nan")
+        if not higher_better and new_value:
+            ratio = old_value / new_value
+        label = "/".join(key)
+        lines.append(
+            f"{label:<36} {old_value:>14.1f} {new_value:>14.1f} {ratio:>9.2f}x"
+        )
+    return lines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.compare")
+    parser.add_argument("base", help="результат предыдущего запуска")
+    parser.add_argument("new", help="результат нового запуска")
+    args = parser.parse_args(argv)
+
+    base, new = _load(args.base), _load(args.new)
+    print(f'{base.get("commit")} -> {new.get("commit")}')
+    print("\n".join(compare(base, new)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Набор замеров производительности: операции core и парсеры engine
+на таблицах разного размера в каждом формате хранения.
+
+    python -m benchmarks.run --sizes 1000 100000 --output results.json
+
+Каждый случай (формат, размер) выполняется в отдельном процессе в пустом
+временном каталоге, поэтому пиковая память (RSS) и размер файлов на диске
+относятся только к нему. Результат - JSON: для каждой операции число
+операций в секунду и задержки p50/p99 в миллисекундах. Два результата
+сравнивает python -m benchmarks.compare.
+
+Отдельно замеряется холодный запуск: каждая команда выполняется
+в новом процессе через project -c, как в скриптах.
+
+    python -m benchmarks.run --startup-only
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from src.primitive_db import core, engine, utils
+from src.primitive_db.utils import STORAGE_COLUMNAR, STORAGE_JSON
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+STORAGES = (STORAGE_JSON, STORAGE_COLUMNAR)
+TABLE = "bench"
+COLUMNS = ["name:str", "age:int", "active:bool"]
+
+# Число повторов операций над одной записью и полных просмотров таблицы
+POINT_OPERATIONS = 200
+PARSER_OPERATIONS = 20000
+
+# Число запусков процесса на каждую команду замера холодного запуска
+STARTUP_RUNS = 20
+
+# Команды замера холодного запуска
+STARTUP_COMMANDS = {
+    "list_tables": "list_tables",
+    "select_by_id": f"select from {TABLE} where ID = 1",
+    "insert": f'insert into {TABLE} values ("new" 1 true)',
+}
+
+
+def _scan_operations(size):
+    """Число повторов полного просмотра: меньше для больших таблиц"""
+    return max(5, min(100, 2000000 // size))
+
+def summarize(timings):
+    """Сводка по длительностям операций в секундах"""
+    ordered = sorted(timings)
+    total = sum(ordered)
+
+    def percentile(value):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * value / 100))] * 1000
+
+    return {
+        "count": len(ordered),
+        "ops_per_sec": len(ordered) / total if total else None,
+        "p50_ms": percentile(50),
+        "p99_ms": percentile(99),
+    }
+
+def measure(func, count):
+    """Вызывает func(i) count раз и возвращает сводку по длительностям"""
+    timings = []
+    for i in range(count):
+        start = time.perf_counter()
+        func(i)
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+def _check(result):
+    """Результат операции core; неудача прерывает замер"""
+    success, value = result
+    if not success:
+        raise RuntimeError(value)
+    return value
+
+def _disk_size(path="."):
+    """Суммарный размер файлов в каталоге"""
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+def _peak_rss_kb():
+    """Пиковый объем памяти процесса в КБ"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # В macOS ru_maxrss в байтах, в Linux - в килобайтах
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def _write_records(filepath, size):
+    """Создает JSONL-файл с size записями для загрузки в таблицу"""
+    with open(filepath, "w", encoding="utf-8") as file:
+        for i in range(size):
+            record = {"name": f"user{i}", "age": i % 100, "active": i % 2 == 0}
+            file.write(json.dumps(record) + "\n")
+
+def _create_table(storage):
+    """Создает таблицу так же, как команда create_table"""
+    metadata = utils.load_metadata()
+    _check(core.create_table(metadata, TABLE, COLUMNS, storage))
+    utils.save_metadata(metadata)
+
+def _where(text):
+    condition, error = engine.parse_where_condition(text)
+    if error:
+        raise RuntimeError(error)
+    return condition
+
+def run_case(storage, size):
+    """Замеры для одной таблицы из size записей в формате storage"""
+    _create_table(storage)
+    _write_records("records.jsonl", size)
+    results = {}
+
+    start = time.perf_counter()
+    _check(core.bulk_load(utils.load_metadata(), TABLE, "records.jsonl"))
+    results["bulk_load"] = {"count": size, "seconds": time.perf_counter() - start}
+    os.remove("records.jsonl")
+
+    rng = random.Random(size)
+    ids = [rng.randint(1, size) for _ in range(POINT_OPERATIONS)]
+    scans = _scan_operations(size)
+
+    def insert(i):
+        values = engine.parse_values_list(f'"new{i}" {i % 100} true')
+        _check(core.insert(utils.load_metadata(), TABLE, values))
+
+    def select_id(i):
+        where = _where(f"ID = {ids[i]}")
+        list(_check(core.select(utils.load_metadata(), TABLE, where)))
+
+    def select_scan(i):
+        where = _where(f"age = {i % 100} and active = true")
+        list(_check(core.select(utils.load_metadata(), TABLE, where)))
+
+    def select_limit(i):
+        list(_check(core.select(utils.load_metadata(), TABLE, limit=100)))
+
+    def select_top(i):
+        order_by = ("name", i % 2 == 1)
+        metadata = utils.load_metadata()
+        list(_check(core.select(metadata, TABLE, limit=10, order_by=order_by)))
+
+    def update(i):
+        where = _where(f"ID = {ids[i]}")
+        _check(core.update(utils.load_metadata(), TABLE, {"age": i % 100}, where))
+
+    def update_scan(i):
+        where = _where(f"age = {i % 100}")
+        _check(core.update(utils.load_metadata(), TABLE, {"active": True}, where))
+
+    def delete(i):
+        _check(core.delete(utils.load_metadata(), TABLE, _where(f"ID = {ids[i]}")))
+
+    def info(i):
+        _check(core.info(utils.load_metadata(), TABLE))
+
+    results["insert"] = measure(insert, POINT_OPERATIONS)
+    results["select_by_id"] = measure(select_id, POINT_OPERATIONS)
+    results["select_scan"] = measure(select_scan, scans)
+    results["select_limit"] = measure(select_limit, POINT_OPERATIONS)
+    results["select_order_limit"] = measure(select_top, scans)
+    results["update_by_id"] = measure(update, POINT_OPERATIONS)
+    results["update_scan"] = measure(update_scan, scans)
+    results["delete_by_id"] = measure(delete, POINT_OPERATIONS)
+    results["info"] = measure(info, POINT_OPERATIONS)
+
+    return {
+        "storage": storage,
+        "size": size,
+        "operations": results,
+        "peak_rss_kb": _peak_rss_kb(),
+        "disk_bytes": _disk_size(),
+    }
+
+def run_parsers():
+    """Замеры парсеров engine (не зависят от размера таблицы)"""
+    cases = {
+        "parse_where": lambda i: engine.parse_where_condition(
+            'age >= 18 and (name = "Bob" or active = true)'
+        ),
+        "parse_set": lambda i: engine.parse_set_clause('name="Bob"'),
+        "parse_values": lambda i: engine.parse_values_list('"Bob" 28 true'),
+        "parse_select": lambda i: engine.parse_select(
+            "select name, count(*) from users where age > 18 group by name limit 10"
+        ),
+    }
+    return {name: measure(func, PARSER_OPERATIONS) for name, func in cases.items()}
+
+def _root():
+    """Корень репозитория"""
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _run_project(command, directory):
+    """Запускает project -c command в новом процессе в каталоге directory"""
+    subprocess.run(
+        [sys.executable, "-m", "src.primitive_db.main", "-c", command],
+        cwd=directory, env=dict(os.environ, PYTHONPATH=_root()),
+        check=True, stdout=subprocess.DEVNULL,
+    )
+
+def run_startup():
+    """
+    Замеры холодного запуска: время от старта процесса project -c
+    до его завершения, включая импорт модулей и чтение метаданных.
+    """
+    with tempfile.TemporaryDirectory(prefix="primitive_db_startup_") as directory:
+        _run_project(f"create_table {TABLE} {' '.join(COLUMNS)}", directory)
+        _run_project(STARTUP_COMMANDS["insert"], directory)
+        return {
+            name: measure(lambda i, command=command: _run_project(command, directory),
+                          STARTUP_RUNS)
+            for name, command in STARTUP_COMMANDS.items()
+        }
+
+def _run_case_process(storage, size):
+    """Выполняет случай в отдельном процессе и возвращает его результат"""
+    root = _root()
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--case", storage, str(size)],
+        cwd=root, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+def _commit():
+    """Текущий коммит git или None"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            check=True, capture_output=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks.run")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+        help="размеры таблиц (по умолчанию 1000 100000 1000000)",
+    )
+    parser.add_argument(
+        "--storage", choices=STORAGES, nargs="+", default=list(STORAGES),
+        help="форматы хранения",
+    )
+    parser.add_argument("--output", help="файл для результата (по умолчанию stdout)")
+    parser.add_argument(
+        "--startup-only", action="store_true",
+        help="только замеры холодного запуска (без парсеров и таблиц)",
+    )
+    parser.add_argument("--case", nargs=2, metavar=("STORAGE", "SIZE"),
+                        help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.case is not None:
+        storage, size = args.case[0], int(args.case[1])
+        with tempfile.TemporaryDirectory(prefix="primitive_db_bench_") as directory:
+            os.chdir(directory)
+            result = run_case(storage, size)
+        print(json.dumps(result))
+        return
+
+    report = {
+        "commit": _commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "startup": run_startup(),
+        "parsers": {} if args.startup_only else run_parsers(),
+        "cases": [],
+    }
+    for storage in [] if args.startup_only else args.storage:
+        for size in args.sizes:
+            print(f"{storage}, {size} записей...", file=sys.stderr, flush=True)
+            report["cases"].append(_run_case_process(storage, size))
+
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(payload + "\n")
+    else:
+        print(payload)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Агрегатные функции SELECT: count, sum, min, max, avg с группировкой.
+Все агрегаты запроса вычисляются за один проход по записям.
+"""
+
+AGGREGATES = ("count", "sum", "min", "max", "avg")
+
+# Функции, которым нужны числовые значения
+NUMERIC_AGGREGATES = ("sum", "avg")
+
+
+def item_label(item):
+    """Заголовок столбца результата для элемента списка SELECT"""
+    if item[0] == "column":
+        return item[1]
+    _, func, column = item
+    return f"{func}({column if column is not None else '*'})"
+
+def _new_states(items):
+    # Состояние агрегата: [количество, сумма, минимум, максимум]
+    return [[0, 0, None, None] for _ in items]
+
+def accumulate(records, items, group_by=None):
+    """
+    Накапливает состояния агрегатов за один проход по records.
+    items - список ("agg", функция, столбец); столбец None означает count(*).
+    Возвращает словарь {значение group_by: список состояний} в порядке
+    первого появления группы. Состояния частей таблицы объединяются
+    merge_groups, итоговые значения дает finalize_groups.
+    """
+    plan = [
+        (column, func in NUMERIC_AGGREGATES, func in ("min", "max"))
+        for _, func, column in items
+    ]
+    groups = {}
+    for record in records:
+        key = record[group_by] if group_by is not None else None
+        states = groups.get(key)
+        if states is None:
+            states = groups[key] = _new_states(items)
+
+        for state, (column, need_sum, need_range) in zip(states, plan):
+            if column is None:
+                state[0] += 1
+                continue
+            value = record[column]
+            state[0] += 1
+            if need_sum:
+                state[1] += value
+            if need_range:
+                if state[2] is None or value < state[2]:
+                    state[2] = value
+                if state[3] is None or value > state[3]:
+                    state[3] = value
+    return groups
+
+def merge_groups(target, source):
+    """Добавляет состояния агрегатов source к target (группы source идут после)"""
+    for key, states in source.items():
+        current = target.get(key)
+        if current is None:
+            target[key] = states
+            continue
+        for state, other in zip(current, states):
+            state[0] += other[0]
+            state[1] += other[1]
+            if other[2] is not None and (state[2] is None or other[2] < state[2]):
+                state[2] = other[2]
+            if other[3] is not None and (state[3] is None or other[3] > state[3]):
+                state[3] = other[3]
+    return target
+
+def finalize_groups(groups, items, group_by=None):
+    """Итоговые значения агрегатов: {значение group_by: список значений}"""
+    if not groups and group_by is None:
+        groups = {None: _new_states(items)}
+    return {
+        key: [_finalize(item[1], state) for item, state in zip(items, states)]
+        for key, states in groups.items()
+    }
+
+def aggregate(records, items, group_by=None):
+    """
+    Вычисляет агрегаты за один проход по records.
+    Возвращает словарь {значение group_by: список значений агрегатов}.
+    """
+    return finalize_groups(accumulate(records, items, group_by), items, group_by)
+
+def _finalize(func, state):
+    """Итоговое значение агрегата по его состоянию"""
+    count, total, minimum, maximum = state
+    if func == "count":
+        return count
+    if func == "sum":
+        return total
+    if func == "min":
+        return minimum
+    if func == "max":
+        return maximum
+    return total / count if count else None
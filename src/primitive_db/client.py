@@ -0,0 +1,90 @@
+"""
+Клиент сервера базы данных (project serve) с пулом соединений.
+
+    pool = ConnectionPool(("127.0.0.1", 8765))
+    print(pool.execute("select from users where age > 18"))
+
+Соединения открываются по мере надобности и возвращаются в пул после
+запроса, поэтому повторные запросы не платят за установку соединения.
+Пул можно использовать из нескольких потоков.
+"""
+import json
+import queue
+import socket
+import threading
+from contextlib import contextmanager
+
+from . import config
+
+
+class Connection:
+    """Одно соединение с сервером"""
+
+    def __init__(self, address):
+        # Строка - путь к Unix-сокету, пара (хост, порт) - TCP
+        if isinstance(address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(address)
+        else:
+            sock = socket.create_connection(address)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket = sock
+        self._file = sock.makefile('rwb')
+
+    def execute(self, command):
+        """Выполняет команду на сервере и возвращает ее вывод"""
+        request = json.dumps({"command": command}, ensure_ascii=False)
+        self._file.write(request.encode('utf-8') + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("сервер закрыл соединение")
+        return json.loads(line)["output"]
+
+    def close(self):
+        """Закрывает соединение"""
+        self._file.close()
+        self._socket.close()
+
+
+class ConnectionPool:
+    """Пул соединений: не больше size одновременно открытых соединений"""
+
+    def __init__(self, address=None, size=None):
+        if address is None:
+            address = (config.SERVER_HOST, config.SERVER_PORT)
+        self.address = address
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size or config.CLIENT_POOL_SIZE)
+
+    @contextmanager
+    def connection(self):
+        """Выдает соединение из пула и возвращает его после использования"""
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = Connection(self.address)
+            try:
+                yield conn
+            except BaseException:
+                # Состояние соединения после ошибки неизвестно
+                conn.close()
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def execute(self, command):
+        """Выполняет команду через свободное соединение пула"""
+        with self.connection() as conn:
+            return conn.execute(command)
+
+    def close(self):
+        """Закрывает все свободные соединения пула"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
@@ -0,0 +1,516 @@
+"""
+Колоночный формат хранения таблиц.
+
+Файл состоит из сигнатуры, JSON-заголовка и блоков столбцов:
+- int  - массив array('q') по 8 байт на значение;
+- bool - битовая карта, 1 бит на значение;
+- str  - массив смещений array('q') (n + 1 значение) и общий UTF-8 блок.
+Имена столбцов хранятся один раз в заголовке, а не в каждой строке.
+
+ColumnarReader отображает файл в память (mmap) и декодирует только
+те строки и столбцы, к которым действительно обращается запрос.
+"""
+import bisect
+import json
+import mmap
+import operator
+import struct
+import sys
+from array import array
+from itertools import compress, repeat, starmap
+
+MAGIC = b"PDBCOL01"
+
+# Блоки столбцов выравниваются по 8 байтам
+_ALIGN = 8
+
+# Диапазон значений столбца int (64-битные числа со знаком)
+INT_MIN = -(1 << 63)
+INT_MAX = (1 << 63) - 1
+
+
+def _pad(size):
+    """Число байт выравнивания после блока заданного размера"""
+    return -size % _ALIGN
+
+def int_overflow(values):
+    """Номер первого значения, не помещающегося в 64 бита, или None"""
+    if not values or (INT_MIN <= min(values) and max(values) <= INT_MAX):
+        return None
+    return next(
+        position for position, value in enumerate(values)
+        if not INT_MIN <= value <= INT_MAX
+    )
+
+def _encode_int(values):
+    """Кодирует столбец int в массив 64-битных чисел"""
+    try:
+        return array('q', values).tobytes()
+    except OverflowError:
+        raise ValueError("Значение int не помещается в 64 бита") from None
+
+def _encode_bool(values):
+    """Кодирует столбец bool в битовую карту"""
+    bitmap = bytearray((len(values) + 7) // 8)
+    for position, value in enumerate(values):
+        if value:
+            bitmap[position >> 3] |= 1 << (position & 7)
+    return bytes(bitmap)
+
+def _encode_str(values):
+    """Кодирует столбец str в смещения и общий UTF-8 блок"""
+    encoded = [str(value).encode('utf-8') for value in values]
+    offsets = array('q', [0])
+    total = 0
+    for chunk in encoded:
+        total += len(chunk)
+        offsets.append(total)
+    offsets_bytes = offsets.tobytes()
+    return offsets_bytes + b"\0" * _pad(len(offsets_bytes)) + b"".join(encoded)
+
+_ENCODERS = {"int": _encode_int, "bool": _encode_bool, "str": _encode_str}
+
+# Операторы сравнения условий WHERE для векторной проверки столбцов
+_OPERATORS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<>": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def encode_table(columns, rows):
+    """
+    Кодирует строки таблицы в колоночный формат.
+    columns - схема таблицы {имя: тип}, rows - список записей.
+    """
+    blocks = []
+    header_columns = []
+    offset = 0
+    for name, col_type in columns.items():
+        block = _ENCODERS[col_type]([row[name] for row in rows])
+        header_columns.append(
+            {"name": name, "type": col_type, "offset": offset, "length": len(block)}
+        )
+        blocks.append(block + b"\0" * _pad(len(block)))
+        offset += len(blocks[-1])
+
+    ids = [row["ID"] for row in rows]
+    ids_sorted = all(a < b for a, b in zip(ids, ids[1:]))
+    header = json.dumps(
+        {
+            "rows": len(rows),
+            "byteorder": sys.byteorder,
+            "ids_sorted": ids_sorted,
+            "columns": header_columns,
+        },
+        ensure_ascii=False,
+    ).encode('utf-8')
+    header += b" " * _pad(len(MAGIC) + 4 + len(header))
+    return MAGIC + struct.pack("<I", len(header)) + header + b"".join(blocks)
+
+def read_header(buffer):
+    """
+    Читает заголовок колоночного файла.
+    Возвращает (заголовок, смещение начала блоков столбцов).
+    """
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError("Файл не является колоночной таблицей")
+    start = len(MAGIC) + 4
+    (header_length,) = struct.unpack("<I", buffer[len(MAGIC):start])
+    header = json.loads(bytes(buffer[start:start + header_length]))
+    return header, start + header_length
+
+def _int_array(buffer, byteorder):
+    """Создает array('q') из байтов с учетом порядка байт файла"""
+    values = array('q')
+    values.frombytes(buffer)
+    if byteorder != sys.byteorder:
+        values.byteswap()
+    return values
+
+def _decode_column(buffer, column, rows, byteorder):
+    """Декодирует один столбец целиком в список значений"""
+    col_type = column["type"]
+    if col_type == "int":
+        return _int_array(buffer[:rows * 8], byteorder).tolist()
+
+    if col_type == "bool":
+        bitmap = bytes(buffer)
+        return [bool(bitmap[i >> 3] >> (i & 7) & 1) for i in range(rows)]
+
+    offsets_size = (rows + 1) * 8
+    offsets = _int_array(buffer[:offsets_size], byteorder)
+    blob = bytes(buffer[offsets_size + _pad(offsets_size):])
+    return [
+        blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(rows)
+    ]
+
+def decode_table(data, record=None):
+    """
+    Декодирует колоночный файл в список записей.
+    record - класс записей таблицы (records.Record); без него записи - словари.
+    """
+    buffer = memoryview(data)
+    header, base = read_header(buffer)
+    rows = header["rows"]
+    names = []
+    values = []
+    for column in header["columns"]:
+        start = base + column["offset"]
+        block = buffer[start:start + column["length"]]
+        names.append(column["name"])
+        values.append(_decode_column(block, column, rows, header["byteorder"]))
+    if record is not None and tuple(names) == record.columns:
+        return list(starmap(record, zip(*values)))
+    rows = [dict(zip(names, row)) for row in zip(*values)]
+    if record is not None:
+        return [record.from_dict(row) for row in rows]
+    return rows
+
+
+class ColumnarReader:
+    """
+    Чтение колоночного файла через mmap без полной загрузки.
+    Значения декодируются по одному при обращении.
+    """
+
+    def __init__(self, filepath):
+        with open(filepath, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        header, base = read_header(self._buffer)
+        self.row_count = header["rows"]
+        self.ids_sorted = header.get("ids_sorted", False)
+        self.column_names = [column["name"] for column in header["columns"]]
+        self._byteorder = header["byteorder"]
+        self._columns = {}
+        for column in header["columns"]:
+            start = base + column["offset"]
+            block = self._buffer[start:start + column["length"]]
+            self._columns[column["name"]] = self._column_accessor(block, column)
+        self._ids = self._columns["ID"]
+
+    def _int_view(self, block, count):
+        """
+        Последовательность из count чисел int поверх блока.
+        При совпадении порядка байт данные не копируются.
+        """
+        block = block[:count * 8]
+        if self._byteorder == sys.byteorder:
+            return block.cast('q')
+        return _int_array(block, self._byteorder)
+
+    def _column_accessor(self, block, column):
+        """Возвращает последовательность: номер строки -> значение столбца"""
+        col_type = column["type"]
+        if col_type == "int":
+            return self._int_view(block, self.row_count)
+
+        if col_type == "bool":
+            return _BoolColumn(block, self.row_count)
+
+        offsets_size = (self.row_count + 1) * 8
+        offsets = self._int_view(block, self.row_count + 1)
+        blob = block[offsets_size + _pad(offsets_size):]
+        return _StrColumn(offsets, blob)
+
+    def value(self, column, position):
+        """Значение столбца в строке с заданным номером"""
+        return self._columns[column][position]
+
+    def find(self, row_id):
+        """Номер строки с заданным ID или None"""
+        if self.ids_sorted:
+            position = bisect.bisect_left(self._ids, row_id)
+            if position < self.row_count and self._ids[position] == row_id:
+                return position
+            return None
+        for position in range(self.row_count):
+            if self._ids[position] == row_id:
+                return position
+        return None
+
+    def row(self, position):
+        """Ленивая запись по номеру строки"""
+        return LazyRow(self, position)
+
+    def column_values(self, column, start=0, stop=None):
+        """Декодирует значения столбца в строках [start, stop) в список"""
+        values = self._columns[column]
+        if stop is None:
+            stop = self.row_count
+        if isinstance(values, (memoryview, array)):
+            return values[start:stop].tolist()
+        return values.tolist(start, stop)
+
+    def mask(self, condition, start=0, stop=None):
+        """
+        Проверяет условие WHERE сразу для всех строк снимка из [start, stop).
+        Каждый столбец условия декодируется один раз целиком, а сравнение
+        выполняется встроенным map без интерпретации условия на строку.
+        Возвращает список bool по числу строк диапазона.
+        """
+        kind = condition[0]
+        if kind == "cmp":
+            _, column, op, value = condition
+            values = self.column_values(column, start, stop)
+            return list(map(_OPERATORS[op], values, repeat(value)))
+
+        combine = operator.and_ if kind == "and" else operator.or_
+        masks = [self.mask(child, start, stop) for child in condition[1]]
+        result = masks[0]
+        for other in masks[1:]:
+            result = list(map(combine, result, other))
+        return result
+
+
+class _BoolColumn:
+    """Столбец bool поверх битовой карты"""
+
+    def __init__(self, bitmap, count):
+        self._bitmap = bitmap
+        self._count = count
+
+    def __getitem__(self, position):
+        return bool(self._bitmap[position >> 3] >> (position & 7) & 1)
+
+    def tolist(self, start=0, stop=None):
+        bitmap = bytes(self._bitmap)
+        if stop is None:
+            stop = self._count
+        return [bool(bitmap[i >> 3] >> (i & 7) & 1) for i in range(start, stop)]
+
+
+class _StrColumn:
+    """Столбец str поверх смещений и UTF-8 блока"""
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __getitem__(self, position):
+        start = self._offsets[position]
+        end = self._offsets[position + 1]
+        return bytes(self._blob[start:end]).decode('utf-8')
+
+    def tolist(self, start=0, stop=None):
+        offsets = self._offsets[start:None if stop is None else stop + 1].tolist()
+        if not offsets:
+            return []
+        # Декодируется только часть общего блока, относящаяся к диапазону
+        base = offsets[0]
+        blob = bytes(self._blob[base:offsets[-1]])
+        return [
+            blob[begin - base:end - base].decode('utf-8')
+            for begin, end in zip(offsets, offsets[1:])
+        ]
+
+
+class LazyRow:
+    """
+    Запись колоночной таблицы, которая декодирует значение столбца
+    только при первом обращении к нему. Поддерживает чтение как словарь.
+    """
+
+    __slots__ = ("_reader", "_position", "_values")
+
+    def __init__(self, reader, position):
+        self._reader = reader
+        self._position = position
+        self._values = {}
+
+    def __getitem__(self, column):
+        try:
+            return self._values[column]
+        except KeyError:
+            pass
+        if column not in self._reader._columns:
+            raise KeyError(column)
+        value = self._reader.value(column, self._position)
+        self._values[column] = value
+        return value
+
+    def __contains__(self, column):
+        return column in self._reader._columns
+
+    def get(self, column, default=None):
+        if column not in self._reader._columns:
+            return default
+        return self[column]
+
+    def keys(self):
+        return list(self._reader.column_names)
+
+    def to_dict(self):
+        """Декодирует запись целиком"""
+        return {column: self[column] for column in self._reader.column_names}
+
+
+class ColumnarRows:
+    """
+    Записи колоночной таблицы для чтения: снимок через ColumnarReader
+    плюс изменения из журнала, еще не попавшие в снимок.
+    Поддерживает ту же часть интерфейса словаря {ID: запись},
+    что и загруженная таблица: get, values и len.
+    """
+
+    def __init__(self, reader, log_entries):
+        self._reader = reader
+        # ID -> запись после изменений из журнала (None - запись удалена)
+        self._changed = {}
+        for entry in log_entries:
+            self._apply(entry)
+        self._length = None
+        self._overlay = None
+
+    def _apply(self, entry):
+        """Применяет запись журнала к наложенным изменениям"""
+        op = entry.get("op")
+        if op == "insert":
+            self._changed[entry["row"]["ID"]] = entry["row"]
+        elif op == "update":
+            for row_id in entry["ids"]:
+                row = self.get(row_id)
+                if row is None:
+                    continue
+                if isinstance(row, LazyRow):
+                    row = row.to_dict()
+                row.update(entry["set"])
+                self._changed[row_id] = row
+        elif op == "delete":
+            for row_id in entry["ids"]:
+                self._changed[row_id] = None
+
+    def get(self, row_id, default=None):
+        if row_id in self._changed:
+            row = self._changed[row_id]
+            return default if row is None else row
+        position = self._reader.find(row_id)
+        if position is None:
+            return default
+        return self._reader.row(position)
+
+    def values(self):
+        """Обходит записи в порядке хранения, затем новые записи из журнала"""
+        changed = self._changed
+        ids = self._reader._ids
+        seen = set()
+        for position in range(self._reader.row_count):
+            row_id = ids[position]
+            if row_id in changed:
+                seen.add(row_id)
+                if changed[row_id] is not None:
+                    yield changed[row_id]
+            else:
+                yield self._reader.row(position)
+        for row_id, row in changed.items():
+            if row is not None and row_id not in seen:
+                yield row
+
+    @property
+    def snapshot_size(self):
+        """Число строк в снимке"""
+        return self._reader.row_count
+
+    def _changed_positions(self):
+        """
+        Раскладывает изменения из журнала на две части:
+        {номер строки снимка: новая запись или None} и список записей,
+        которых в снимке нет.
+        """
+        if self._overlay is None:
+            reader = self._reader
+            if reader.ids_sorted:
+                positions = {row_id: reader.find(row_id) for row_id in self._changed}
+            else:
+                ids = reader._ids
+                positions = {
+                    ids[position]: position
+                    for position in range(reader.row_count)
+                    if ids[position] in self._changed
+                }
+            in_snapshot = {}
+            new_rows = []
+            for row_id, row in self._changed.items():
+                position = positions.get(row_id)
+                if position is not None:
+                    in_snapshot[position] = row
+                elif row is not None:
+                    new_rows.append(row)
+            self._overlay = (in_snapshot, new_rows)
+        return self._overlay
+
+    def match_positions(self, condition, predicate, start=0, stop=None):
+        """
+        Номера строк снимка из [start, stop), удовлетворяющих условию
+        (condition None - все строки). Строки снимка отбираются векторной
+        маской по столбцам условия, измененные журналом записи проверяются
+        скомпилированным predicate.
+        """
+        if stop is None:
+            stop = self._reader.row_count
+        if condition is None:
+            hits = range(start, stop)
+        else:
+            mask = self._reader.mask(condition, start, stop)
+            hits = compress(range(start, stop), mask)
+
+        changed = self._changed_positions()[0]
+        if not changed:
+            return list(hits)
+
+        candidates = set(hits)
+        candidates.update(position for position in changed if start <= position < stop)
+        return [
+            position for position in sorted(candidates)
+            if position not in changed
+            or (
+                changed[position] is not None
+                and (predicate is None or predicate(changed[position]))
+            )
+        ]
+
+    def row_at(self, position):
+        """Запись по номеру строки снимка с учетом изменений из журнала"""
+        changed = self._changed_positions()[0]
+        if position in changed:
+            return changed[position]
+        return self._reader.row(position)
+
+    def project(self, positions, columns, start=0, stop=None):
+        """
+        Записи только со столбцами columns для номеров строк из [start, stop).
+        Столбцы декодируются целиком по диапазону: это быстрее, чем
+        обращение к LazyRow за каждым значением.
+        """
+        values = [self._reader.column_values(column, start, stop) for column in columns]
+        changed = self._changed_positions()[0]
+        for position in positions:
+            if position in changed:
+                yield changed[position]
+            else:
+                offset = position - start
+                yield dict(zip(columns, [column[offset] for column in values]))
+
+    def new_rows(self):
+        """Записи из журнала, которых нет в снимке"""
+        return self._changed_positions()[1]
+
+    def scan(self, condition, predicate):
+        """Обходит записи, удовлетворяющие условию, в порядке хранения"""
+        for position in self.match_positions(condition, predicate):
+            yield self.row_at(position)
+        for row in self.new_rows():
+            if predicate(row):
+                yield row
+
+    def __len__(self):
+        if self._length is None:
+            in_snapshot, new_rows = self._changed_positions()
+            deleted = sum(row is None for row in in_snapshot.values())
+            self._length = self._reader.row_count - deleted + len(new_rows)
+        return self._length
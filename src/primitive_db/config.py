@@ -0,0 +1,70 @@
+"""
+Настройки производительности базы данных.
+Значения по умолчанию можно переопределить переменными окружения.
+"""
+import os
+
+
+def _env_int(name, default):
+    """Читает целое число из переменной окружения"""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+def _env_float(name, default):
+    """Читает дробное число из переменной окружения"""
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+# Минимальное число записей в журнале таблицы до его уплотнения
+LOG_COMPACT_MIN_ENTRIES = _env_int("PRIMITIVE_DB_LOG_COMPACT_MIN", 1000)
+
+# Доля размера таблицы, после которой журнал уплотняется
+LOG_COMPACT_RATIO = _env_float("PRIMITIVE_DB_LOG_COMPACT_RATIO", 1.0)
+
+# Бюджет памяти кэша таблиц в байтах (оценивается по размеру файлов)
+TABLE_CACHE_MAX_BYTES = _env_int("PRIMITIVE_DB_CACHE_BYTES", 256 * 1024 * 1024)
+
+# Размер пакета строк, проверяемого за раз при массовой загрузке
+BULK_LOAD_BATCH_ROWS = _env_int("PRIMITIVE_DB_BULK_BATCH", 10000)
+
+# Число строк на одной странице вывода SELECT
+SELECT_PAGE_ROWS = _env_int("PRIMITIVE_DB_PAGE_ROWS", 100)
+
+# Сколько секунд ждать блокировку таблицы, занятую другим процессом
+LOCK_TIMEOUT = _env_float("PRIMITIVE_DB_LOCK_TIMEOUT", 10.0)
+
+# Адрес сервера по умолчанию (project serve)
+SERVER_HOST = os.environ.get("PRIMITIVE_DB_HOST", "127.0.0.1")
+SERVER_PORT = _env_int("PRIMITIVE_DB_PORT", 8765)
+
+# Сколько секунд сервер копит команды записи перед групповой фиксацией
+GROUP_COMMIT_DELAY = _env_float("PRIMITIVE_DB_GROUP_COMMIT_DELAY", 0.002)
+
+# Наибольшее число команд записи в одной групповой фиксации
+GROUP_COMMIT_MAX = _env_int("PRIMITIVE_DB_GROUP_COMMIT_MAX", 1000)
+
+# Число соединений в пуле клиента
+CLIENT_POOL_SIZE = _env_int("PRIMITIVE_DB_POOL_SIZE", 8)
+
+# Число процессов для параллельного просмотра таблиц без подходящего индекса
+SCAN_WORKERS = _env_int("PRIMITIVE_DB_SCAN_WORKERS", os.cpu_count() or 1)
+
+# Таблицы меньше этого числа строк просматриваются в одном процессе
+PARALLEL_SCAN_MIN_ROWS = _env_int("PRIMITIVE_DB_PARALLEL_MIN_ROWS", 200000)
+
+# Наибольшее число команд записи в одной транзакции пакетного режима (project exec)
+BATCH_COMMIT_MAX = _env_int("PRIMITIVE_DB_BATCH_COMMIT_MAX", 10000)
+
+# Сколько разобранных команд хранить в кэше планов (0 - не кэшировать)
+PLAN_CACHE_SIZE = _env_int("PRIMITIVE_DB_PLAN_CACHE_SIZE", 256)
+
+# Число ID в одном сегменте новых таблиц (0 - хранить таблицу одним файлом)
+SEGMENT_ROWS = _env_int("PRIMITIVE_DB_SEGMENT_ROWS", 100000)
+
+# Сколько записей ORDER BY сортирует в памяти; больший результат
+# сортируется сериями во временных файлах с последующим слиянием
+SORT_BUFFER_ROWS = _env_int("PRIMITIVE_DB_SORT_BUFFER_ROWS", 500000)
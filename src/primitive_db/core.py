@@ -1,10 +1,53 @@
-from prettytable import PrettyTable
+from itertools import chain, islice, starmap
+from operator import itemgetter
 
-from .utils import load_table_data, save_table_data
+from . import config, parallel
+from .aggregate import NUMERIC_AGGREGATES, aggregate, item_label
+from .columnar import ColumnarRows, int_overflow
+from .join import hash_join, index_join
+from .loader import convert_column, iter_batches, read_records
+from .locks import writes_table
+from .profiling import count, iterate, mark, phase, timed
+from .records import record_type
+from .segments import SegmentedRows
+from .sorting import sort_key, sort_records, top_k
+from .stats import distinct_count
+from .utils import (
+    SNAPSHOT_EXTENSIONS,
+    STORAGE_COLUMNAR,
+    STORAGE_JSON,
+    analyze_table,
+    begin_transaction,
+    commit_transaction,
+    convert_table_storage,
+    create_table_index,
+    in_transaction,
+    insert_table_rows,
+    load_table,
+    open_table,
+    remove_table_data,
+    rollback_transaction,
+    table_segment_stats,
+    table_stats,
+    write_table_changes,
+)
+from .where import (
+    columns_of,
+    compile_condition,
+    conjuncts,
+    from_dict,
+    map_columns,
+    map_values,
+)
 
 # Поддерживаемые типы данных
 SUPPORTED_TYPES = {'int', 'str', 'bool'}
 
+# Сообщение для команд, которые сразу переписывают файлы таблиц
+TRANSACTION_FORBIDDEN = (
+    "Команда недоступна внутри транзакции. Выполните commit или rollback."
+)
+
 def validate_column_definition(column_def):
     """
     Проверяет корректность определения столбца.
@@ -25,11 +68,12 @@ def validate_column_definition(column_def):
     
     return True, (name, col_type)
 
-def create_table(metadata, table_name, columns):
+def create_table(metadata, table_name, columns, storage=STORAGE_JSON):
 
     """
     Создает новую таблицу в метаданных.
     Автоматически добавляет столбец ID:int.
+    storage - формат хранения данных: json или columnar.
     """
     # Проверяем имя таблицы
     if not table_name or not table_name.strip():
@@ -39,6 +83,12 @@ def create_table(metadata, table_name, columns):
     if table_name in metadata:
         return False, f'Таблица "{table_name}" уже существует.'
 
+    if storage not in SNAPSHOT_EXTENSIONS:
+        return False, (
+            f'Неизвестный формат хранения: {storage}. '
+            f'Доступные: {", ".join(SNAPSHOT_EXTENSIONS)}'
+        )
+
     # Инициируем новый словарь со столбцом ID
     table_columns = {"ID": "int"}
     
@@ -61,12 +111,45 @@ def create_table(metadata, table_name, columns):
         table_columns[col_name] = col_type
     
     # Сохраняем таблицу в метаданные
-    metadata[table_name] = {"columns": table_columns}
+    metadata[table_name] = {
+        "columns": table_columns,
+        "next_id": 1,
+        "storage": storage,
+    }
+    # Снимок новой таблицы делится на сегменты по диапазонам ID
+    if config.SEGMENT_ROWS > 0:
+        metadata[table_name]["segment_rows"] = config.SEGMENT_ROWS
     
     # Формируем сообщение об успехе
     columns_str = ", ".join([f"{name}:{typ}" for name, typ in table_columns.items()])
     return True, f'Таблица "{table_name}" успешно создана со столбцами: {columns_str}'
 
+@writes_table
+def convert_table(metadata, table_name, storage):
+
+    """
+    Переводит данные таблицы в другой формат хранения.
+    """
+
+    if table_name not in metadata:
+        return False, f'Таблица "{table_name}" не существует.'
+
+    if storage not in SNAPSHOT_EXTENSIONS:
+        return False, (
+            f'Неизвестный формат хранения: {storage}. '
+            f'Доступные: {", ".join(SNAPSHOT_EXTENSIONS)}'
+        )
+
+    if in_transaction():
+        return False, TRANSACTION_FORBIDDEN
+
+    if not convert_table_storage(table_name, metadata[table_name], storage):
+        return False, f'Не удалось перевести таблицу "{table_name}" в формат {storage}.'
+
+    metadata[table_name]["storage"] = storage
+    return True, f'Таблица "{table_name}" переведена в формат {storage}.'
+
+@writes_table
 def drop_table(metadata, table_name):
 
     """
@@ -75,8 +158,12 @@ def drop_table(metadata, table_name):
 
     if table_name not in metadata:
         return False, f'Таблица "{table_name}" не существует.'
+
+    if in_transaction():
+        return False, TRANSACTION_FORBIDDEN
     
     del metadata[table_name]
+    remove_table_data(table_name)
     return True, f'Таблица "{table_name}" успешно удалена.'
 
 def list_tables(metadata):
@@ -92,8 +179,240 @@ def list_tables(metadata):
     else:
         return "\n".join([f"- {table}" for table in tables])
 
+@writes_table
+def create_index(metadata, table_name, column):
+    """
+    Создает индекс по столбцу таблицы.
+    Индекс ускоряет поиск по равенству и по диапазону значений.
+    """
+    if table_name not in metadata:
+        return False, f'Таблица "{table_name}" не существует.'
+
+    if column not in metadata[table_name]["columns"]:
+        return False, f'Столбец "{column}" не существует в таблице "{table_name}".'
+
+    indexes = metadata[table_name].setdefault("indexes", [])
+    if column in indexes:
+        return False, f'Индекс по столбцу "{column}" уже существует.'
+
+    if in_transaction():
+        return False, TRANSACTION_FORBIDDEN
+
+    if not create_table_index(table_name, column, metadata[table_name]):
+        return False, f'Не удалось построить индекс по столбцу "{column}".'
+
+    indexes.append(column)
+    return True, f'Индекс по столбцу "{column}" таблицы "{table_name}" успешно создан.'
+
+# ========== ТРАНЗАКЦИИ ==========
+
+def begin():
+    """Начинает транзакцию"""
+    if not begin_transaction():
+        return False, "Транзакция уже открыта."
+    return True, "Транзакция начата."
+
+def commit():
+    """Фиксирует изменения транзакции одной атомарной записью"""
+    if not in_transaction():
+        return False, "Нет открытой транзакции."
+    if not commit_transaction():
+        return False, "Не удалось зафиксировать транзакцию."
+    return True, "Транзакция зафиксирована."
+
+def rollback():
+    """Отменяет изменения транзакции"""
+    if not rollback_transaction():
+        return False, "Нет открытой транзакции."
+    return True, "Транзакция отменена."
+
 # ========== CRUD ОПЕРАЦИИ ==========
 
+def _load_table(metadata, table_name):
+    """Загружает таблицу вместе с объявленными в метаданных индексами"""
+    return load_table(table_name, metadata[table_name])
+
+def _read_table(metadata, table_name, condition=None):
+    """
+    Открывает таблицу только для чтения (без полной загрузки, если возможно).
+    По condition пропускаются сегменты, где подходящих записей нет.
+    """
+    return open_table(table_name, metadata[table_name], condition)
+
+def prepare_condition(metadata, table_name, where_clause):
+    """
+    Готовит условие WHERE к выполнению: проверяет столбцы, приводит
+    значения к типам столбцов и один раз компилирует условие в функцию.
+    where_clause - дерево условия или словарь {столбец: значение}.
+    Возвращает (True, (условие, функция проверки)) или (False, сообщение).
+    """
+    if not where_clause:
+        return True, (None, None)
+
+    condition = where_clause
+    if isinstance(where_clause, dict):
+        condition = from_dict(where_clause)
+
+    columns = metadata[table_name]["columns"]
+    unknown = sorted(columns_of(condition) - set(columns))
+    if unknown:
+        return False, f'Столбец "{unknown[0]}" не существует в таблице "{table_name}"'
+
+    errors = []
+
+    def convert(column, value):
+        is_valid, result = validate_value(value, columns[column])
+        if not is_valid:
+            errors.append(result)
+        return result
+
+    condition = map_values(condition, convert)
+    if errors:
+        return False, errors[0]
+    return True, (condition, compile_condition(condition))
+
+def _index_candidates(table, condition):
+    """
+    Выбирает записи-кандидаты по индексам для условий верхнего уровня AND.
+    Возвращает None, если подходящего индекса нет и нужен полный проход.
+    """
+    parts = conjuncts(condition)
+
+    # Первичный индекс по ID
+    for _, column, operator, value in parts:
+        if column == "ID" and operator == "=":
+            mark("index", "ID")
+            record = table["rows"].get(value)
+            return [record] if record is not None else []
+
+    indexes = table["indexes"]
+    for _, column, operator, value in parts:
+        if operator == "=" and column in indexes:
+            mark("index", column)
+            return indexes[column].lookup(value)
+
+    # Диапазон по отсортированному индексу
+    for column, index in indexes.items():
+        low = high = None
+        include_low = include_high = True
+        for _, part_column, operator, value in parts:
+            if part_column != column:
+                continue
+            if operator in (">", ">=") and (
+                low is None or value > low or (value == low and operator == ">")
+            ):
+                low, include_low = value, operator == ">="
+            elif operator in ("<", "<=") and (
+                high is None or value < high or (value == high and operator == "<")
+            ):
+                high, include_high = value, operator == "<="
+        if low is not None or high is not None:
+            mark("index", f"{column} (диапазон)")
+            return index.range(low, high, include_low, include_high)
+
+    mark("index", None)
+    return None
+
+def _iter_records(table, condition, predicate, parallel_scan=False):
+    """
+    Лениво выдает записи, удовлетворяющие условию.
+    Условие на ID проверяется по первичному индексу за O(1),
+    равенство и диапазоны по индексированным столбцам - по индексам.
+    Остальные условия проверяются скомпилированной функцией predicate
+    (колоночные таблицы проверяются векторной маской по столбцам).
+    С parallel_scan полный просмотр большой таблицы делится между
+    процессами; тогда результат собирается целиком до выдачи первой записи.
+    """
+    rows = table["rows"]
+    if condition is None:
+        yield from iterate("scan", rows.values(), "rows_scanned")
+        return
+
+    # Строки считаются по мере просмотра: с limit он обрывается раньше
+    candidates = _index_candidates(table, condition)
+    if candidates is not None:
+        yield from filter(predicate, iterate("scan", candidates, "rows_scanned"))
+        return
+
+    if table.get("record") is not None:
+        # Все записи таблицы - экземпляры одного класса Record:
+        # при полном просмотре условие читает значения прямо из слотов
+        predicate = compile_condition(condition, table["record"])
+    # Параллельный просмотр собирает результат целиком до первой записи,
+    # поэтому он выполняется, только если процессов действительно несколько
+    workers = parallel.worker_count(len(rows)) if parallel_scan else 1
+    if workers > 1:
+        count("rows_scanned", len(rows))
+        mark("parallel", workers)
+        yield from parallel.scan(rows, condition, predicate)
+        return
+
+    parts = rows.parts() if isinstance(rows, SegmentedRows) else [rows]
+    for part in parts:
+        if isinstance(part, ColumnarRows):
+            # Колоночная часть проверяется векторной маской целиком
+            count("rows_scanned", len(part))
+            yield from part.scan(condition, predicate)
+        else:
+            records = iterate("scan", part.values(), "rows_scanned")
+            yield from filter(predicate, records)
+
+def _index_order(table, index, descending):
+    """
+    Записи таблицы в порядке столбца по отсортированному индексу.
+    Записей с пустым значением в индексе нет: они добавляются в конец
+    (при убывании - в начало), как при сортировке.
+    """
+    rows = table["rows"]
+    ordered = index.ordered(descending)
+    if len(index.sorted_keys) == len(rows):
+        return ordered
+    nulls = (row for row in rows.values() if row.get(index.column) is None)
+    return chain(nulls, ordered) if descending else chain(ordered, nulls)
+
+def _sorted_records(table, condition, predicate, order_by, limit=None):
+    """
+    Лениво выдает записи, удовлетворяющие условию, в порядке order_by -
+    (столбец, по убыванию). limit - сколько первых записей нужно.
+    По отсортированному индексу столбца записи выдаются сразу по порядку,
+    без сортировки (если условие не сужается другим индексом).
+    Иначе первые limit записей отбираются кучей, а без limit результат
+    сортируется целиком (большой - сериями во временных файлах).
+    """
+    column, descending = order_by
+    index = table["indexes"].get(column)
+    if index is not None and (
+        condition is None or _index_candidates(table, condition) is None
+    ):
+        mark("order", f"по индексу {column}")
+        ordered = _index_order(table, index, descending)
+        records = iterate("scan", ordered, "rows_scanned")
+        if condition is None:
+            return records
+        if table.get("record") is not None:
+            predicate = compile_condition(condition, table["record"])
+        return filter(predicate, records)
+
+    records = _iter_records(table, condition, predicate, parallel_scan=True)
+    return _sort(records, order_by, limit)
+
+def _sort(records, order_by, limit=None):
+    """Сортирует записи: первые limit - кучей, все - sort_records"""
+    column, descending = order_by
+    key = sort_key(column)
+    if limit is not None:
+        mark("order", f"куча, первые {limit}")
+        with phase("sort"):
+            return iter(top_k(records, key, limit, descending))
+    return iterate("sort", sort_records(records, key, descending))
+
+def _find_records(table, condition, predicate):
+    """Находит все записи, удовлетворяющие условию"""
+    with phase("scan"):
+        records = list(_iter_records(table, condition, predicate, parallel_scan=True))
+    count("rows_returned", len(records))
+    return records
+
 def validate_value(value, expected_type):
 
     """Валидирует значение по типу"""
@@ -122,6 +441,19 @@ def validate_value(value, expected_type):
     
     return False, f'Неизвестный тип: {expected_type}'
 
+def _check_storage_value(value, col_type, storage):
+    """
+    Проверяет, что проверенное по типу значение можно сохранить
+    в формате хранения таблицы: колоночный снимок хранит int в 64 битах.
+    Возвращает сообщение об ошибке или None.
+    """
+    if storage != STORAGE_COLUMNAR or col_type != "int":
+        return None
+    if int_overflow([value]) is not None:
+        return f'Значение {value} не помещается в 64-битный int колоночной таблицы'
+    return None
+
+@writes_table
 def insert(metadata, table_name, values):
 
     """
@@ -131,21 +463,19 @@ def insert(metadata, table_name, values):
         return False, f'Таблица "{table_name}" не существует'
     
     # Загружаем текущие данные
-    table_data = load_table_data(table_name)
+    table = _load_table(metadata, table_name)
     
     # Получаем схему таблицы
     columns = metadata[table_name]["columns"]
     column_names = list(columns.keys())
+    storage = metadata[table_name].get("storage", STORAGE_JSON)
     
     # Проверяем количество значений (без ID)
     if len(values) != len(column_names) - 1:
         return False, f'Ожидается {len(column_names)-1} значений для полей, получено {len(values)}'
 
-   # Генерируем ID
-    if table_data:
-        new_id = max(item.get("ID", 0) for item in table_data) + 1
-    else:
-        new_id = 1
+    # Берем ID из счетчика таблицы
+    new_id = table["next_id"]
 
     # Создаем словарь для валидированных данных и сразу добавляем ID
     validated_columns_with_values = {"ID": new_id}
@@ -154,145 +484,630 @@ def insert(metadata, table_name, values):
     columns_with_values_without_id = zip(column_names[1:], values)
 
     # Валидация значений согласно типу в метаданных
-    for col_name, value in columns_with_values_without_id:
-        col_type = columns[col_name]
+    with phase("validate"):
+        for col_name, value in columns_with_values_without_id:
+            col_type = columns[col_name]
 
-        # Валидация типа
-        is_valid, validated_value = validate_value(value, col_type)
-        if not is_valid:
-            return False, validated_value
-        validated_columns_with_values[col_name] = validated_value        
+            # Валидация типа
+            is_valid, validated_value = validate_value(value, col_type)
+            if not is_valid:
+                return False, validated_value
+            error = _check_storage_value(validated_value, col_type, storage)
+            if error:
+                return False, error
+            validated_columns_with_values[col_name] = validated_value
     
     # Добавляем запись
-    table_data.append(validated_columns_with_values)
-    save_table_data(table_name, table_data)
+    write_table_changes(
+        table_name, [{"op": "insert", "row": validated_columns_with_values}]
+    )
     
     return True, f'Запись с ID={new_id} успешно добавлена в таблицу "{table_name}".'
 
-def select(metadata, table_name, where_clause=None):
+@writes_table
+def bulk_load(metadata, table_name, filepath):
+
+    """
+    Загружает записи из CSV или JSONL файла.
+    Файл читается потоково, значения проверяются пакетами по столбцам,
+    ID выделяются одним блоком, а данные записываются один раз в конце.
+    """
+    if table_name not in metadata:
+        return False, f'Таблица "{table_name}" не существует'
+
+    columns = metadata[table_name]["columns"]
+    column_names = [name for name in columns if name != "ID"]
+    columnar = metadata[table_name].get("storage") == STORAGE_COLUMNAR
+    table = _load_table(metadata, table_name)
+    next_id = table["next_id"]
+
+    # Записи сразу создаются компактными: столбец ID в схеме первый
+    record = record_type(columns)
+    new_rows = []
+    try:
+        for batch in iter_batches(
+            read_records(filepath, column_names), config.BULK_LOAD_BATCH_ROWS
+        ):
+            batch_columns = [list(values) for values in zip(*batch)]
+
+            # Проверяем типы целиком по каждому столбцу пакета
+            for position, col_name in enumerate(column_names):
+                col_type = columns[col_name]
+                is_valid, result = convert_column(batch_columns[position], col_type)
+                if not is_valid:
+                    value = batch_columns[position][result]
+                    record_number = len(new_rows) + result + 1
+                    return False, (
+                        f'Запись {record_number}: значение "{value}" столбца '
+                        f'"{col_name}" не может быть преобразовано в {col_type}'
+                    )
+                if columnar and col_type == "int":
+                    overflow = int_overflow(result)
+                    if overflow is not None:
+                        return False, (
+                            f'Запись {len(new_rows) + overflow + 1}: значение '
+                            f'{result[overflow]} столбца "{col_name}" '
+                            f'не помещается в 64-битный int колоночной таблицы'
+                        )
+                batch_columns[position] = result
+
+            # ID выделяются блоком подряд
+            ids = range(next_id, next_id + len(batch))
+            next_id += len(batch)
+            new_rows.extend(starmap(record, zip(ids, *batch_columns)))
+    except FileNotFoundError:
+        return False, f'Файл "{filepath}" не найден'
+    except (ValueError, UnicodeDecodeError) as e:
+        return False, f'Ошибка чтения файла "{filepath}": {e}'
+
+    if not new_rows:
+        return True, f'Файл "{filepath}" не содержит записей.'
+
+    if not insert_table_rows(table_name, new_rows, metadata[table_name]):
+        return False, f'Не удалось сохранить записи в таблицу "{table_name}".'
+
+    return True, (
+        f'Загружено {len(new_rows)} записей в таблицу "{table_name}" '
+        f'(ID {new_rows[0]["ID"]}-{new_rows[-1]["ID"]}).'
+    )
+
+def select(
+    metadata, table_name, where_clause=None, limit=None, offset=0, prepared=None,
+    order_by=None,
+):
+
+    """
+    Выбирает записи с возможностью фильтрации.
+    Возвращает генератор: записи находятся по мере чтения результата,
+    поэтому первая строка доступна сразу, а весь результат не хранится
+    в памяти. limit и offset ограничивают выборку.
+    prepared - уже готовый результат prepare_condition для where_clause.
+    order_by - (столбец, по убыванию) для сортировки результата.
+    """
+
+    if table_name not in metadata:
+        return False, f'Таблица "{table_name}" не существует'
+    
+    if order_by is not None:
+        success, message = check_columns(metadata, table_name, [order_by[0]])
+        if not success:
+            return False, message
+    
+    success, result = prepared or prepare_condition(metadata, table_name, where_clause)
+    if not success:
+        return False, result
+    
+    table = _read_table(metadata, table_name, result[0])
+    if order_by is not None:
+        stop = None if limit is None else offset + limit
+        records = _sorted_records(table, *result, order_by, stop)
+    else:
+        # С limit выгоднее остановиться на первых найденных записях,
+        # чем просматривать всю таблицу параллельно
+        records = _iter_records(table, *result, parallel_scan=limit is None)
+    
+    if offset or limit is not None:
+        stop = None if limit is None else offset + limit
+        records = islice(records, offset, stop)
+    
+    return True, iterate("scan", records, "rows_returned")
+
+def _resolve_join_columns(metadata, tables, names):
+    """
+    Находит столбцы соединения: таблица.столбец или столбец без имени
+    таблицы, если он есть только в одной из таблиц.
+    Возвращает (True, {имя: (таблица, столбец)}) или (False, сообщение).
+    """
+    resolved = {}
+    for name in names:
+        table_name, _, column = name.rpartition(".")
+        if table_name:
+            if table_name not in tables:
+                return False, f'Таблица "{table_name}" не участвует в запросе'
+            if column not in metadata[table_name]["columns"]:
+                return False, (
+                    f'Столбец "{column}" не существует в таблице "{table_name}"'
+                )
+            resolved[name] = (table_name, column)
+            continue
+        owners = [table for table in tables if name in metadata[table]["columns"]]
+        if not owners:
+            return False, (
+                f'Столбец "{name}" не существует в таблицах {", ".join(tables)}'
+            )
+        if len(owners) > 1:
+            return False, (
+                f'Столбец "{name}" есть в обеих таблицах, укажите таблицу: '
+                f'{owners[0]}.{name}'
+            )
+        resolved[name] = (owners[0], name)
+    return True, resolved
+
+def _join_lookup(table, column):
+    """
+    Поиск записей таблицы по значению столбца без просмотра: по первичному
+    ключу ID загруженной таблицы или по индексу столбца. None - если индекса нет.
+    """
+    rows = table["rows"]
+    if column != "ID" or not isinstance(rows, dict):
+        index = table["indexes"].get(column)
+        return index.lookup if index is not None else None
+
+    def lookup(value):
+        row = rows.get(value)
+        return () if row is None else (row,)
+    return lookup
+
+def _join_pairs(tables, sides, keys, limit=None):
+    """
+    Пары записей (запись первой таблицы, запись второй) для соединения.
+    sides - {таблица: (состояние таблицы, условие, функция проверки)},
+    keys - {таблица: столбец соединения}.
+    Индекс по столбцу соединения используется вместо хеш-таблицы,
+    если записи этой таблицы не отбираются условием; иначе хеш-таблица
+    строится по меньшей таблице, а большая просматривается потоком.
+    """
+    sizes = {name: len(sides[name][0]["rows"]) for name in tables}
+    lookups = {
+        name: _join_lookup(sides[name][0], keys[name])
+        for name in tables if sides[name][1] is None
+    }
+    indexed = [name for name, lookup in lookups.items() if lookup is not None]
+    if indexed:
+        build = max(indexed, key=sizes.get)
+    else:
+        build = min(tables, key=sizes.get)
+    probe = tables[1] if build == tables[0] else tables[0]
+    # Без limit просматриваемую таблицу выгодно разделить между процессами;
+    # с limit соединение останавливается на первых парах
+    probe_records = _iter_records(*sides[probe], parallel_scan=limit is None)
+
+    if indexed:
+        mark("join", f"индекс {build}.{keys[build]}")
+        pairs = index_join(lookups[build], probe_records, keys[probe])
+    else:
+        mark("join", f"хеш-таблица по {build} ({sizes[build]} записей)")
+        build_records = _iter_records(*sides[build], parallel_scan=True)
+        pairs = hash_join(build_records, probe_records, keys[build], keys[probe])
+
+    if build == tables[0]:
+        return ((left, right) for right, left in pairs)
+    return pairs
+
+def select_join(
+    metadata, table_name, join, items=None, where_clause=None, limit=None, offset=0,
+    order_by=None,
+):
+
+    """
+    Выбирает записи соединения двух таблиц по равенству столбцов:
+    select ... from a join b on a.x = b.y. join - {"table": b, "on": (x, y)}.
+    Столбцы записей результата - "таблица.столбец"; в items, where_clause
+    и order_by столбец можно указать без таблицы, если имя однозначно.
+    Условия WHERE на одну таблицу проверяются при чтении ее записей
+    (и используют ее индексы), остальные - на записях результата.
+    Возвращает (True, (заголовки, генератор записей)).
+    """
+
+    tables = (table_name, join["table"])
+    for name in tables:
+        if name not in metadata:
+            return False, f'Таблица "{name}" не существует'
+    if tables[0] == tables[1]:
+        return False, "Соединение таблицы с самой собой не поддерживается"
+    if any(item[0] != "column" for item in items or []):
+        return False, "Агрегатные функции в запросах с join не поддерживаются"
+
+    names = list(join["on"]) + [item[1] for item in items or []]
+    if where_clause is not None:
+        names.extend(sorted(columns_of(where_clause)))
+    if order_by is not None:
+        names.append(order_by[0])
+    success, resolved = _resolve_join_columns(metadata, tables, names)
+    if not success:
+        return False, resolved
+
+    keys = dict(resolved[name] for name in join["on"])
+    if len(keys) != 2:
+        return False, "Условие ON должно связывать столбцы двух разных таблиц"
+    key_types = [metadata[name]["columns"][column] for name, column in keys.items()]
+    if key_types[0] != key_types[1]:
+        return False, f'Столбцы соединения разных типов: {" и ".join(key_types)}'
+
+    def qualified(column):
+        return ".".join(resolved[column])
+
+    # Условия верхнего уровня AND на столбцы одной таблицы проверяются
+    # при ее чтении, остальные - после соединения
+    pushed = {name: [] for name in tables}
+    residual = []
+    if where_clause is not None:
+        parts = where_clause[1] if where_clause[0] == "and" else [where_clause]
+        for node in parts:
+            owners = {resolved[column][0] for column in columns_of(node)}
+            if len(owners) == 1:
+                pushed[owners.pop()].append(
+                    map_columns(node, lambda column: resolved[column][1])
+                )
+            else:
+                residual.append(map_columns(node, qualified))
 
-    """Выбирает записи с возможностью фильтрации"""
+    sides = {}
+    for name in tables:
+        nodes = pushed[name]
+        condition = ("and", nodes) if len(nodes) > 1 else (nodes[0] if nodes else None)
+        success, result = prepare_condition(metadata, name, condition)
+        if not success:
+            return False, result
+        sides[name] = (_read_table(metadata, name, result[0]), *result)
+
+    # Записи результата - словари {таблица.столбец: значение}
+    labels = {
+        name: [f"{name}.{column}" for column in metadata[name]["columns"]]
+        for name in tables
+    }
+    getters = {name: itemgetter(*metadata[name]["columns"]) for name in tables}
+
+    def combine(left, right):
+        record = dict(zip(labels[tables[0]], getters[tables[0]](left)))
+        record.update(zip(labels[tables[1]], getters[tables[1]](right)))
+        return record
+
+    stop = None if limit is None else offset + limit
+    records = starmap(combine, _join_pairs(tables, sides, keys, stop))
+
+    if residual:
+        # Проверка значений и компиляция - как для условия одной таблицы
+        # со столбцами обеих таблиц
+        columns = {
+            f"{name}.{column}": column_type
+            for name in tables
+            for column, column_type in metadata[name]["columns"].items()
+        }
+        joined = f"{tables[0]} join {tables[1]}"
+        condition = ("and", residual) if len(residual) > 1 else residual[0]
+        success, result = prepare_condition(
+            {joined: {"columns": columns}}, joined, condition
+        )
+        if not success:
+            return False, result
+        records = filter(result[1], records)
 
+    if order_by is not None:
+        records = _sort(records, (qualified(order_by[0]), order_by[1]), stop)
+    if offset or limit is not None:
+        records = islice(records, offset, stop)
+
+    if items:
+        columns = [qualified(item[1]) for item in items]
+    else:
+        columns = labels[tables[0]] + labels[tables[1]]
+    return True, (columns, iterate("scan", records, "rows_returned"))
+
+def check_columns(metadata, table_name, column_names):
+    """Проверяет, что все столбцы существуют в таблице"""
     if table_name not in metadata:
         return False, f'Таблица "{table_name}" не существует'
     
-    table_data = load_table_data(table_name)
+    columns = metadata[table_name]["columns"]
+    for column in column_names:
+        if column not in columns:
+            return False, f'Столбец "{column}" не существует в таблице "{table_name}"'
+    return True, None
+
+def _aggregate_from_indexes(table, items, group_by):
+    """
+    Пытается получить агрегаты без прохода по записям: count(*) - из числа
+    записей, min/max - из концов отсортированного индекса, count(*) по
+    группам - из размеров корзин хеш-индекса.
+    Возвращает словарь групп как aggregate() или None.
+    """
+    rows = table["rows"]
+    indexes = table["indexes"]
+
+    if group_by is not None:
+        index = indexes.get(group_by)
+        if index is None:
+            return None
+        if any(func != "count" or column is not None for _, func, column in items):
+            return None
+        return {
+            value: [len(bucket)] * len(items) for value, bucket in index.buckets.items()
+        }
+
+    values = []
+    for _, func, column in items:
+        if func == "count" and column is None:
+            values.append(len(rows))
+        elif func in ("min", "max") and column in indexes:
+            keys = indexes[column].sorted_keys
+            if not keys:
+                values.append(None)
+            else:
+                values.append(keys[0][0] if func == "min" else keys[-1][0])
+        else:
+            return None
+    return {None: values}
+
+def select_aggregate(
+    metadata, table_name, items, where_clause=None, group_by=None, prepared=None,
+    order_by=None,
+):
+
+    """
+    Вычисляет агрегаты count, sum, min, max, avg с группировкой.
+    items - список ("agg", функция, столбец) и ("column", столбец) для
+    столбца группировки. Все агрегаты считаются за один проход по записям;
+    если возможно, ответ берется из счетчиков и индексов без прохода.
+    prepared - уже готовый результат prepare_condition для where_clause.
+    order_by - (заголовок столбца результата, по убыванию) для сортировки.
+    Возвращает (True, (заголовки, записи результата)).
+    """
+
+    aggregates = [item for item in items if item[0] == "agg"]
+    plain = [item[1] for item in items if item[0] == "column"]
+    
+    columns_used = [column for _, _, column in aggregates if column is not None]
+    if group_by is not None:
+        columns_used.append(group_by)
+    success, message = check_columns(metadata, table_name, columns_used + plain)
+    if not success:
+        return False, message
+    
+    if any(column != group_by for column in plain):
+        return False, "Без агрегатной функции можно выбрать только столбец из GROUP BY"
     
-    if where_clause is None:
-        return True, table_data
+    columns = metadata[table_name]["columns"]
+    for _, func, column in aggregates:
+        numeric = func in NUMERIC_AGGREGATES
+        if numeric and column is not None and columns[column] == "str":
+            return False, f'Функция {func} неприменима к строковому столбцу "{column}"'
+    
+    labels = [item_label(item) for item in items]
+    if order_by is not None and order_by[0] not in labels:
+        return False, (
+            f'Сортировать можно только по столбцу результата: {", ".join(labels)}'
+        )
+    
+    success, result = prepared or prepare_condition(metadata, table_name, where_clause)
+    if not success:
+        return False, result
     
-    # Фильтруем данные
-    filtered_data = []
-    for record in table_data:
-        match = True
-        for column, expected_value in where_clause.items():
-            if column not in record or record[column] != expected_value:
-                match = False
-                break
-        if match:
-            filtered_data.append(record)
+    table = _read_table(metadata, table_name, result[0])
+    groups = None
+    if result[0] is None:
+        groups = _aggregate_from_indexes(table, aggregates, group_by)
+        if groups is not None:
+            mark("index", "счетчики и индексы")
+    if groups is None:
+        condition, predicate = result
+        rows = table["rows"]
+        with phase("scan"):
+            workers = parallel.worker_count(len(rows))
+            if workers > 1 and (
+                condition is None or _index_candidates(table, condition) is None
+            ):
+                count("rows_scanned", len(rows))
+                mark("parallel", workers)
+                groups = parallel.aggregate(
+                    rows, condition, predicate, aggregates, group_by
+                )
+            else:
+                groups = aggregate(_iter_records(table, *result), aggregates, group_by)
     
-    return True, filtered_data
+    records = []
+    for key, values in groups.items():
+        values = iter(values)
+        record = {}
+        for item, label in zip(items, labels):
+            record[label] = key if item[0] == "column" else next(values)
+        records.append(record)
+    if order_by is not None:
+        # Групп немного: они сортируются в памяти
+        records.sort(key=sort_key(order_by[0]), reverse=order_by[1])
+    count("rows_returned", len(records))
+    return True, (labels, records)
 
-def update(metadata, table_name, set_clause, where_clause):
+@writes_table
+def update(metadata, table_name, set_clause, where_clause, prepared=None):
 
-    """Обновляет записи по условию"""
+    """
+    Обновляет записи по условию.
+    prepared - уже готовый результат prepare_condition для where_clause.
+    """
 
     if table_name not in metadata:
         return False, f'Таблица "{table_name}" не существует'
     
-    table_data = load_table_data(table_name)
-    updated_count = 0
+    success, result = prepared or prepare_condition(metadata, table_name, where_clause)
+    if not success:
+        return False, result
     
-    for record in table_data:
-        # Проверяем условие WHERE
-        match = True
-        for column, expected_value in where_clause.items():
-            if column not in record or record[column] != expected_value:
-                match = False
-                break
-        
-        if match:
-            # Обновляем поля согласно SET
-            for column, new_value in set_clause.items():
-                if column in record and column != "ID":  # ID нельзя менять
-                    # Валидируем новое значение
-                    col_type = metadata[table_name]["columns"][column]
-                    is_valid, validated_value = validate_value(new_value, col_type)
-                    if is_valid:
-                        record[column] = validated_value
-            updated_count += 1
-    
-    if updated_count > 0:
-        save_table_data(table_name, table_data)
+    table = _load_table(metadata, table_name)
+
+    # Валидируем новые значения один раз на весь запрос
+    storage = metadata[table_name].get("storage", STORAGE_JSON)
+    changes = {}
+    with phase("validate"):
+        for column, new_value in set_clause.items():
+            col_type = metadata[table_name]["columns"].get(column)
+            if col_type is None or column == "ID":  # ID нельзя менять
+                continue
+            is_valid, validated_value = validate_value(new_value, col_type)
+            if is_valid:
+                error = _check_storage_value(validated_value, col_type, storage)
+                if error:
+                    return False, error
+                changes[column] = validated_value
+
+    records = _find_records(table, *result)
+    updated_count = len(records)
+    
+    # В журнал попадают только записи, значения которых действительно меняются
+    updated_ids = [
+        record["ID"] for record in records
+        if any(record.get(column) != value for column, value in changes.items())
+    ]
+    if updated_ids:
+        write_table_changes(
+            table_name, [{"op": "update", "ids": updated_ids, "set": changes}]
+        )
     
     return True, f'Обновлено {updated_count} записей в таблице "{table_name}".'
 
-def delete(metadata, table_name, where_clause):
+@writes_table
+def delete(metadata, table_name, where_clause, prepared=None):
 
-    """Удаляет записи по условию"""
+    """
+    Удаляет записи по условию.
+    prepared - уже готовый результат prepare_condition для where_clause.
+    """
 
     if table_name not in metadata:
         return False, f'Таблица "{table_name}" не существует'
     
-    table_data = load_table_data(table_name)
-    initial_count = len(table_data)
+    success, result = prepared or prepare_condition(metadata, table_name, where_clause)
+    if not success:
+        return False, result
     
-    # Фильтруем записи, которые НЕ удовлетворяют условию
-    filtered_data = []
-    for record in table_data:
-        match = True
-        for column, expected_value in where_clause.items():
-            if column not in record or record[column] != expected_value:
-                match = False
-                break
-        if not match:
-            filtered_data.append(record)
+    table = _load_table(metadata, table_name)
     
-    deleted_count = initial_count - len(filtered_data)
+    deleted_ids = [record["ID"] for record in _find_records(table, *result)]
+    deleted_count = len(deleted_ids)
     
     if deleted_count > 0:
-        save_table_data(table_name, filtered_data)
+        write_table_changes(table_name, [{"op": "delete", "ids": deleted_ids}])
     
     return True, f'Удалено {deleted_count} записей из таблицы "{table_name}".'
 
 def info(metadata, table_name):
 
-    """Выводит информацию о таблице"""
+    """
+    Выводит информацию о таблице.
+    Число записей и статистика столбцов берутся из поддерживаемой
+    статистики таблицы, без просмотра записей.
+    """
 
     if table_name not in metadata:
         return False, f'Таблица "{table_name}" не существует'
     
     columns = metadata[table_name]["columns"]
-    table_data = load_table_data(table_name)
+    stats = table_stats(table_name, metadata[table_name])
     
     columns_str = ", ".join([f"{name}:{typ}" for name, typ in columns.items()])
     result = f'Таблица: {table_name}\n'
     result += f'Столбцы: {columns_str}\n'
-    result += f'Количество записей: {len(table_data)}'
+    result += f'Формат хранения: {metadata[table_name].get("storage", STORAGE_JSON)}\n'
+    indexes = metadata[table_name].get("indexes")
+    if indexes:
+        result += f'Индексы: {", ".join(indexes)}\n'
+    segment_rows = metadata[table_name].get("segment_rows")
+    if segment_rows:
+        segments = table_segment_stats(table_name, metadata[table_name])
+        filled = sum(1 for stats in segments.values() if stats["rows"])
+        result += f'Сегменты: {filled} по {segment_rows} ID\n'
+    result += f'Количество записей: {stats["rows"]}'
+    for column in columns:
+        result += f'\n  {column}: {_format_column_stats(stats, column)}'
     
     return True, result
 
-def display_table(data, columns):
-    """Выводит данные в виде красивой таблицы с помощью PrettyTable"""
-    if not data:
-        print("Нет данных для отображения")
-        return
-    
-    table = PrettyTable()
-    table.field_names = list(columns.keys())
+def _format_column_stats(stats, column):
+    """Строка статистики столбца для info"""
+    column_stats = stats["columns"][column]
+    if column_stats["min"] is None:
+        return "нет значений"
+    parts = [
+        f'min {column_stats["min"]}',
+        f'max {column_stats["max"]}',
+        f'различных ~{distinct_count(stats, column)}',
+    ]
+    present = stats["rows"] - column_stats["nulls"]
+    if "true" in column_stats and present:
+        parts.append(f'true {column_stats["true"] / present:.1%}')
+    if column_stats["nulls"]:
+        parts.append(f'пустых {column_stats["nulls"] / stats["rows"]:.1%}')
+    return ", ".join(parts)
+
+@writes_table
+def analyze(metadata, table_name):
+
+    """
+    Пересчитывает статистику таблицы по всем записям.
+    """
+
+    if table_name not in metadata:
+        return False, f'Таблица "{table_name}" не существует.'
+
+    if in_transaction():
+        return False, TRANSACTION_FORBIDDEN
+
+    stats = analyze_table(table_name, metadata[table_name])
+    return True, (
+        f'Статистика таблицы "{table_name}" пересчитана: {stats["rows"]} записей.'
+    )
+
+@timed("display")
+def display_table(data, columns, page_size=None):
+    """
+    Выводит данные в виде красивой таблицы с помощью PrettyTable.
+    data может быть генератором: записи выводятся страницами по page_size
+    строк по мере поступления, и в памяти хранится только одна страница.
+    """
+    if page_size is None:
+        page_size = config.SELECT_PAGE_ROWS
     
-    for record in data:
-        row = []
-        for col in columns.keys():
-            value = record.get(col, "")
-            # Преобразуем булевы значения для красивого отображения
-            if isinstance(value, bool):
-                value = "True" if value else "False"
-            row.append(value)
-        table.add_row(row)
+    records = iter(data)
+    shown = 0
+    while True:
+        page = list(islice(records, page_size))
+        if not page:
+            break
+        
+        # prettytable импортируется только когда есть что выводить:
+        # это заметная часть времени запуска
+        from prettytable import PrettyTable
+        
+        table = PrettyTable()
+        table.field_names = list(columns)
+        
+        for record in page:
+            row = []
+            for col in columns:
+                value = record.get(col, "")
+                # Преобразуем булевы значения для красивого отображения
+                if isinstance(value, bool):
+                    value = "True" if value else "False"
+                row.append(value)
+            table.add_row(row)
+        
+        print(table, flush=True)
+        shown += len(page)
     
-    print(table)
+    if not shown:
+        print("Нет данных для отображения")
+    elif shown > page_size:
+        print(f"Выведено записей: {shown}")
 
 def print_help():
 
@@ -303,14 +1118,63 @@ def print_help():
     print("\n***Операции с данными***")
     print("Функции:")
     print("<command> insert into <имя_таблицы> values (<значение1>, <значение2>, ...) - создать запись")
-    print("<command> select from <имя_таблицы> [where <столбец>=<значение>] - прочитать записи")
-    print("<command> update <имя_таблицы> set <столбец>=<значение> where <столбец>=<значение> - обновить запись")
-    print("<command> delete from <имя_таблицы> where <столбец>=<значение> - удалить запись")
+    print(
+        "<command> load <имя_таблицы> from <файл.csv|файл.jsonl>"
+        " - загрузить записи из файла"
+    )
+    print(
+        "<command> select from <имя_таблицы> [where <условие>]"
+        " [order by <столбец> [asc|desc]] [limit <N>] [offset <M>]"
+        " - прочитать записи"
+    )
+    print(
+        "<command> select ... from <таблица1> join <таблица2>"
+        " on <таблица1.столбец> = <таблица2.столбец> [where <условие>]"
+        " - соединить таблицы"
+    )
+    print(
+        "<command> select count(*), sum(<столбец>), min(..), max(..), avg(..)"
+        " from <имя_таблицы> [where <условие>] [group by <столбец>] - агрегаты"
+    )
+    print(
+        "<command> update <имя_таблицы> set <столбец>=<значение>"
+        "[, <столбец>=<значение> ...] where <условие> - обновить записи"
+    )
+    print("<command> delete from <имя_таблицы> where <условие> - удалить запись")
     print("<command> info <имя_таблицы> - вывести информацию о таблице")
-    print("<command> create_table <имя_таблицы> <столбец1:тип> <столбец2:тип> .. - создать таблицу")
+    print("<command> analyze <имя_таблицы> - пересчитать статистику таблицы")
+    print(
+        "<command> create_table <имя_таблицы> <столбец1:тип> <столбец2:тип> .."
+        " [using columnar] - создать таблицу"
+    )
+    print(
+        "<command> convert_table <имя_таблицы> <json|columnar>"
+        " - сменить формат хранения таблицы"
+    )
     print("<command> list_tables - показать список всех таблиц")
     print("<command> drop_table <имя_таблицы> - удалить таблицу")
+    print("<command> create_index <имя_таблицы> <столбец> - создать индекс по столбцу")
+    print(
+        "<command> begin / commit / rollback"
+        " - начать, зафиксировать или отменить транзакцию"
+    )
+    print(
+        "<command> prepare <имя> as <команда с параметрами ?>"
+        " - подготовить команду insert, select, update или delete"
+    )
+    print(
+        "<command> execute <имя> (<значение1>, <значение2>, ...)"
+        " - выполнить подготовленную команду"
+    )
+    print(
+        "<command> explain analyze <команда>"
+        " - выполнить команду и показать время по фазам"
+    )
+    print("<command> \\timing on|off - показывать время по фазам после каждой команды")
+    print("<command> \\profile on [<файл>]|off - выполнять команды под cProfile")
     print("<command> exit - выход из программы")
     print("<command> help - справочная информация")
+    print("\nУсловие WHERE: сравнения =, !=, <, <=, >, >=, связки and/or и скобки.")
+    print('Например: where age >= 18 and (name = "Bob" or active = true)')
     print("\nВнимание! Разделяйте параметры пробелами, а не запятыми или прочими разделителями!")
     print("Если вы собираетесь использовать в названии таблиц или столбцов пробелы, экранируйте их кавычками.\n")
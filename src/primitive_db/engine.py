@@ -1,8 +1,17 @@
 import shlex
+from collections import OrderedDict
+from itertools import islice
 
-import prompt
-
+from . import config
+from .aggregate import AGGREGATES, item_label
 from .core import (
+    analyze,
+    begin,
+    bulk_load,
+    check_columns,
+    commit,
+    convert_table,
+    create_index,
     create_table,
     delete,
     display_table,
@@ -10,11 +19,36 @@ from .core import (
     info,
     insert,
     list_tables,
+    prepare_condition,
     print_help,
+    rollback,
     select,
+    select_aggregate,
+    select_join,
     update,
 )
-from .utils import load_metadata, save_metadata
+from .fileio import StorageError
+from .locks import acquire, metadata_lock_path, release
+from .profiling import begin as begin_measurement
+from .profiling import end as end_measurement
+from .profiling import format_report, mark, run_profiled
+from .utils import (
+    begin_transaction,
+    commit_transaction,
+    in_transaction,
+    load_metadata,
+    recover_transaction,
+    rollback_transaction,
+    save_metadata,
+)
+from .where import (
+    PARAMETER,
+    is_keyword,
+    map_values,
+    parse_condition,
+    parse_literal,
+    tokenize,
+)
 
 
 def parse_value(value_str):
@@ -36,211 +70,906 @@ def parse_value(value_str):
     
     return value_str
 
+def split_clause(user_input, keyword):
+    """
+    Делит исходную строку команды по первому ключевому слову вне кавычек.
+    Возвращает (текст до слова, текст после слова) или (строка, None).
+    """
+    tokens, error = tokenize(user_input)
+    if error:
+        return user_input, None
+    for token in tokens:
+        if is_keyword(token, keyword):
+            end = token.start + len(token.value)
+            return user_input[:token.start], user_input[end:]
+    return user_input, None
+
+def parse_where_with_tail(where_str):
+    """
+    Парсит условие WHERE, за которым могут идти другие части команды.
+    Возвращает (условие, оставшиеся слова, ошибка).
+    """
+    if where_str is None:
+        return None, [], "Отсутствует условие WHERE"
+    tokens, error = tokenize(where_str)
+    if error:
+        return None, [], error
+    if not tokens:
+        return None, [], "Пустое условие WHERE"
+    
+    condition, position, error = parse_condition(tokens)
+    if error:
+        return None, [], error
+    return condition, [token.value for token in tokens[position:]], None
+
 def parse_where_condition(where_str):
     """
-    Парсит условие WHERE в формате "столбец=значение"
-    Возвращает словарь {столбец: значение}
+    Парсит условие WHERE: сравнения =, !=, <, <=, >, >=, связки and/or и скобки.
+    Например: age >= 18 and (name = "Bob" or active = true)
+    Возвращает дерево условия (см. модуль where).
     """
-    if "=" not in where_str:
-        return None, 'Неверный формат условия WHERE. Ожидается: "столбец=значение"'
+    condition, tail, error = parse_where_with_tail(where_str)
+    if error:
+        return None, error
+    if tail:
+        return None, f'Лишний текст в условии WHERE: "{" ".join(tail)}"'
+    return condition, None
+
+def parse_set_clause(set_str):
+    """
+    Парсит SET выражение: "столбец=значение[, столбец=значение ...]"
+    Возвращает (словарь {столбец: значение}, ошибка)
+    """
+    format_error = (
+        'Неверный формат SET. Ожидается: "столбец=значение[, столбец=значение ...]"'
+    )
+    tokens, error = tokenize(set_str)
+    if error:
+        return None, error
     
-    parts = where_str.split("=", 1)
-    column = parts[0].strip()
-    value_str = parts[1].strip()
+    set_clause = {}
+    position = 0
+    while position < len(tokens):
+        column, operator, value = (tokens[position:position + 3] + [None, None])[:3]
+        if (
+            value is None
+            or column.kind not in ("word", "string")
+            or operator.kind != "op" or operator.value != "="
+            or value.kind not in ("word", "string")
+        ):
+            return None, format_error
+        if column.value in set_clause:
+            return None, f'Столбец "{column.value}" указан в SET несколько раз'
+        set_clause[column.value] = parse_literal(value)
+        position += 3
+        
+        # Пары разделяются запятыми
+        if position < len(tokens):
+            if not _is_punct(tokens, position, ",") or position + 1 == len(tokens):
+                return None, format_error
+            position += 1
     
-    # Парсим значение
-    value = parse_value(value_str)
+    if not set_clause:
+        return None, format_error
+    return set_clause, None
+
+def parse_limit_offset(args):
+    """
+    Отделяет от аргументов команды хвост "limit N" и/или "offset M".
+    Возвращает (оставшиеся аргументы, limit, offset, ошибка).
+    """
+    limit = None
+    offset = 0
+    args = list(args)
+    while len(args) >= 2 and args[-2].lower() in ("limit", "offset"):
+        keyword, value = args[-2].lower(), args[-1]
+        if not value.isdigit():
+            return args, None, 0, (
+                f"Значение {keyword} должно быть неотрицательным целым числом"
+            )
+        if keyword == "limit":
+            limit = int(value)
+        else:
+            offset = int(value)
+        args = args[:-2]
+    return args, limit, offset, None
+
+def _is_punct(tokens, position, value):
+    """Проверяет, что в позиции position стоит знак value"""
+    return (
+        position < len(tokens)
+        and tokens[position].kind == "punct"
+        and tokens[position].value == value
+    )
+
+def _parse_select_items(tokens, position):
+    """
+    Разбирает список SELECT до ключевого слова from:
+    столбцы и агрегаты вида count(*), sum(столбец).
+    """
+    items = []
+    while True:
+        if position >= len(tokens):
+            raise ValueError("Ожидается ключевое слово from")
+        token = tokens[position]
+        if token.kind not in ("word", "string"):
+            raise ValueError(f'Ожидается столбец или функция, получено "{token.value}"')
+        
+        if token.kind == "word" and _is_punct(tokens, position + 1, "("):
+            func = token.value.lower()
+            if func not in AGGREGATES:
+                raise ValueError(f"Неизвестная функция: {token.value}")
+            if position + 2 >= len(tokens) or not _is_punct(tokens, position + 3, ")"):
+                raise ValueError(f"Ожидается {func}(<столбец>)")
+            argument = tokens[position + 2]
+            star = argument.value == "*" and argument.kind == "word"
+            column = None if star else argument.value
+            if column is None and func != "count":
+                raise ValueError(f"Функция {func}(*) не поддерживается")
+            items.append(("agg", func, column))
+            position += 4
+        else:
+            items.append(("column", token.value))
+            position += 1
+        
+        if _is_punct(tokens, position, ","):
+            position += 1
+            continue
+        return items, position
+
+def _parse_join(tokens, position):
+    """
+    Разбирает JOIN после ключевого слова join: <таблица> on <столбец> = <столбец>.
+    Возвращает ({"table": таблица, "on": (столбец, столбец)}, позиция).
+    """
+    if position >= len(tokens) or tokens[position].kind not in ("word", "string"):
+        raise ValueError("Не указана таблица JOIN")
+    table = tokens[position].value
+    on = tokens[position + 1:position + 5]
+    if (
+        len(on) < 4
+        or not is_keyword(on[0], "on")
+        or on[1].kind not in ("word", "string")
+        or on[2].kind != "op" or on[2].value != "="
+        or on[3].kind not in ("word", "string")
+    ):
+        raise ValueError("Ожидается: join <таблица> on <столбец> = <столбец>")
+    return {"table": table, "on": (on[1].value, on[3].value)}, position + 5
+
+def _parse_order_by(tokens, position):
+    """
+    Разбирает ORDER BY после ключевых слов order by: столбец или агрегат
+    (как в списке SELECT) и необязательное направление asc/desc.
+    Возвращает ((заголовок столбца, по убыванию), позиция).
+    """
+    if position >= len(tokens):
+        raise ValueError("Не указан столбец ORDER BY")
+    items, position = _parse_select_items(tokens, position)
+    if len(items) != 1:
+        raise ValueError("Сортировка поддерживается только по одному столбцу")
+    descending = False
+    if position < len(tokens) and is_keyword(tokens[position], "asc", "desc"):
+        descending = is_keyword(tokens[position], "desc")
+        position += 1
+    return (item_label(items[0]), descending), position
+
+def parse_select(user_input):
+    """
+    Парсит команду SELECT:
+    select [<столбцы и агрегаты>] from <таблица>
+           [join <таблица> on <столбец> = <столбец>] [where <условие>]
+           [group by <столбец>] [order by <столбец> [asc|desc]]
+           [limit <N>] [offset <M>]
+    Возвращает (словарь с частями запроса, ошибка).
+    """
+    tokens, error = tokenize(user_input)
+    if error:
+        return None, error
     
-    return {column: value}, None
+    query = {
+        "items": None, "join": None, "where": None, "group_by": None, "order_by": None,
+    }
+    position = 1
+    try:
+        if position < len(tokens) and not is_keyword(tokens[position], "from"):
+            query["items"], position = _parse_select_items(tokens, position)
+        
+        if position >= len(tokens) or not is_keyword(tokens[position], "from"):
+            raise ValueError("Ожидается ключевое слово from")
+        table = tokens[position + 1] if position + 1 < len(tokens) else None
+        if table is None or table.kind not in ("word", "string"):
+            raise ValueError("Не указано имя таблицы")
+        query["table"] = table.value
+        position += 2
+        
+        if position < len(tokens) and is_keyword(tokens[position], "join"):
+            query["join"], position = _parse_join(tokens, position + 1)
+        
+        if position < len(tokens) and is_keyword(tokens[position], "where"):
+            # Условие разбирается по исходному тексту, поэтому кавычки сохраняются
+            query["where"], position, error = parse_condition(tokens, position + 1)
+            if error:
+                raise ValueError(error)
+        
+        if position + 1 < len(tokens) and is_keyword(tokens[position], "group") \
+                and is_keyword(tokens[position + 1], "by"):
+            if position + 2 >= len(tokens):
+                raise ValueError("Не указан столбец GROUP BY")
+            query["group_by"] = tokens[position + 2].value
+            position += 3
+        
+        if position + 1 < len(tokens) and is_keyword(tokens[position], "order") \
+                and is_keyword(tokens[position + 1], "by"):
+            query["order_by"], position = _parse_order_by(tokens, position + 2)
+    except ValueError as e:
+        return None, str(e)
+    
+    tail, query["limit"], query["offset"], error = parse_limit_offset(
+        [token.value for token in tokens[position:]]
+    )
+    if error:
+        return None, error
+    if tail:
+        return None, f'Не удалось разобрать: "{" ".join(tail)}"'
+    return query, None
 
-def parse_set_clause(set_str):
+# Команды, которые читают и переписывают метаданные
+SCHEMA_COMMANDS = ("create_table", "convert_table", "drop_table", "create_index")
+
+# Команды работы с записями, которые разбираются в план
+PLAN_COMMANDS = ("insert", "select", "update", "delete")
+
+# Команды записи, которые пакетный режим объединяет в одну транзакцию
+WRITE_COMMANDS = ("insert", "update", "delete")
+
+# Кэш разобранных команд: нормализованный текст -> план (вытеснение LRU)
+_plan_cache = OrderedDict()
+
+# Подготовленные команды (prepare): имя -> план с параметрами ?
+_prepared = {}
+
+def parse_plan(user_input):
     """
-    Парсит SET выражение в формате "столбец=значение"
-    Возвращает словарь {столбец: значение}
+    Разбирает команду insert, select, update или delete в план -
+    словарь с именем команды, таблицей и разобранными частями команды.
+    "parameters" - число параметров ? в команде.
+    Возвращает (план, текст ошибки); (None, None) - команда другого вида.
     """
-    if "=" not in set_str:
-        return None, 'Неверный формат SET. Ожидается: "столбец=значение"'
+    parts = user_input.split(None, 1)
+    command = parts[0].lower() if parts else ""
+    if command not in PLAN_COMMANDS:
+        return None, None
+    
+    if command == "select":
+        # select from users
+        # select from users where age>=25 limit 10 offset 20
+        # select name, age from users where age=25
+        # select count(*), avg(age) from users group by name
+        query, error = parse_select(user_input)
+        if error:
+            return None, f"Ошибка: {error}"
+        plan = {"command": "select", **query}
+        return _with_parameter_count(plan), None
+    
+    args = shlex.split(user_input)[1:]
+    if command == "insert" and len(args) >= 4 and args[0] == "into":
+        # Ищем индекс "values"
+        values_index = -1
+        for i, arg in enumerate(args):
+            if arg.lower() == "values":
+                values_index = i
+                break
+        
+        if values_index == -1:
+            return None, "Ошибка: Отсутствует ключевое слово 'values'"
+        
+        # Значения разбираются по исходному тексту: кавычки отличают
+        # строку "?" от параметра ?
+        _, values_str = split_clause(user_input, "values")
+        values = parse_values_list(values_str)
+        plan = {"command": "insert", "table": args[1], "values": values}
+        return _with_parameter_count(plan), None
     
-    parts = set_str.split("=", 1)
-    column = parts[0].strip()
-    value_str = parts[1].strip()
+    if command == "update" and len(args) >= 5 and "set" in args and "where" in args:
+        # update users set age=26, name="Bob" where name="John"
+        _, after_set = split_clause(user_input, "set")
+        set_str, where_str = split_clause(after_set, "where")
+        
+        set_clause, set_error = parse_set_clause(set_str)
+        where_clause, where_error = parse_where_condition(where_str)
+        
+        if set_error:
+            return None, f"Ошибка в SET: {set_error}"
+        if where_error:
+            return None, f"Ошибка в WHERE: {where_error}"
+        plan = {
+            "command": "update",
+            "table": args[0],
+            "set": set_clause,
+            "where": where_clause,
+        }
+        return _with_parameter_count(plan), None
     
-    value = parse_value(value_str)
+    is_delete = len(args) >= 4 and args[0] == "from" and args[2] == "where"
+    if command == "delete" and is_delete:
+        # delete from users where ID=1
+        _, where_str = split_clause(user_input, "where")
+        
+        where_clause, error = parse_where_condition(where_str)
+        if error:
+            return None, f"Ошибка: {error}"
+        plan = {"command": "delete", "table": args[1], "where": where_clause}
+        return _with_parameter_count(plan), None
     
-    return {column: value}, None
+    return None, None
 
-def parse_values_list(values_str):
-    """Парсит список значений в формате (value1, value2, value3)"""
-    # Убираем скобки если есть
-    values_str = values_str.strip()
-    if values_str.startswith("(") and values_str.endswith(")"):
-        values_str = values_str[1:-1].strip()
+def _substitute(plan, replace):
+    """
+    Копия плана, в которой каждое значение из values, SET и WHERE
+    заменено на replace(значение) - в порядке их следования в команде.
+    """
+    result = {key: value for key, value in plan.items() if key != "prepared"}
+    if "values" in plan:
+        result["values"] = [replace(value) for value in plan["values"]]
+    if "set" in plan:
+        result["set"] = {
+            column: replace(value) for column, value in plan["set"].items()
+        }
+    if plan.get("where") is not None:
+        result["where"] = map_values(
+            plan["where"], lambda column, value: replace(value)
+        )
+    return result
+
+def _with_parameter_count(plan):
+    """Дополняет план числом параметров ?"""
+    found = []
+    _substitute(plan, lambda value: found.append(value is PARAMETER) or value)
+    plan["parameters"] = sum(found)
+    return plan
+
+def bind_parameters(plan, values):
+    """План подготовленной команды с подставленными значениями параметров"""
+    values = iter(values)
+    bound = _substitute(
+        plan, lambda value: next(values) if value is PARAMETER else value
+    )
+    bound["parameters"] = 0
+    return bound
+
+def parse_parameters(params_str):
+    """
+    Разбирает значения параметров команды execute: ("Bob", 28) или "Bob" 28.
+    Возвращает (список значений, ошибка).
+    """
+    tokens, error = tokenize(params_str)
+    if error:
+        return None, error
+    values = []
+    for token in tokens:
+        if token.kind == "punct":
+            continue
+        if token.kind not in ("word", "string"):
+            return None, f'Неожиданное значение параметра "{token.value}"'
+        values.append(parse_literal(token))
+    return values, None
+
+def _normalize(user_input):
+    """Ключ кэша планов: текст команды без лишних пробелов"""
+    text = user_input.strip()
+    # Пробелы внутри кавычек - часть значения, их не трогаем
+    if '"' not in text and "'" not in text:
+        text = " ".join(text.split())
+    return text
+
+def lookup_plan(user_input):
+    """
+    Возвращает (план, ошибка) для команды работы с записями: из кэша
+    планов или разобранный заново. Для других команд - (None, None).
+    """
+    key = _normalize(user_input)
+    plan = _plan_cache.get(key)
+    if plan is not None:
+        _plan_cache.move_to_end(key)
+        mark("plan", "из кэша")
+        return plan, None
+    mark("plan", "разобран заново")
+    
+    plan, error = parse_plan(key)
+    if plan is not None and config.PLAN_CACHE_SIZE > 0:
+        _plan_cache[key] = plan
+        if len(_plan_cache) > config.PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return plan, error
+
+def _prepared_condition(metadata, plan):
+    """
+    Условие WHERE плана, подготовленное к выполнению (prepare_condition).
+    Хранится в плане, пока не изменились столбцы таблицы.
+    """
+    table_meta = metadata.get(plan["table"])
+    if table_meta is None:
+        return None
+    columns = table_meta["columns"]
+    cached = plan.get("prepared")
+    if cached is not None and cached[0] == columns:
+        return cached[1]
+    result = prepare_condition(metadata, plan["table"], plan["where"])
+    plan["prepared"] = (dict(columns), result)
+    return result
+
+def run_plan(metadata, plan):
+    """Выполняет план команды работы с записями и печатает результат"""
+    command = plan["command"]
+    table_name = plan["table"]
+    
+    if command == "insert":
+        success, message = insert(metadata, table_name, plan["values"])
+        print(message)
     
-    # Если строка пустая после удаления скобок
-    if not values_str:
-        return []
+    elif command == "update":
+        success, message = update(
+            metadata, table_name, plan["set"], plan["where"],
+            prepared=_prepared_condition(metadata, plan),
+        )
+        print(message)
     
-    # Используем shlex для корректного разбиения с учетом кавычек
-    values = shlex.split(values_str)
+    elif command == "delete":
+        success, message = delete(
+            metadata, table_name, plan["where"],
+            prepared=_prepared_condition(metadata, plan),
+        )
+        print(message)
     
-    # Парсим значения и возвращаем результат
-    return [parse_value(val) for val in values]
+    elif command == "select":
+        items = plan["items"] or []
+        limit, offset = plan["limit"], plan["offset"]
+        
+        if plan["join"] is not None:
+            if plan["group_by"] is not None:
+                print("Группировка в запросах с join не поддерживается")
+                return
+            success, result = select_join(
+                metadata, table_name, plan["join"], items, plan["where"],
+                limit, offset, order_by=plan["order_by"],
+            )
+            if not success:
+                print(result)
+                return
+            display_table(result[1], result[0])
+            return
+        
+        prepared = _prepared_condition(metadata, plan)
+        
+        if plan["group_by"] is not None or any(item[0] == "agg" for item in items):
+            success, result = select_aggregate(
+                metadata, table_name, items, plan["where"], plan["group_by"],
+                prepared=prepared, order_by=plan["order_by"],
+            )
+            if not success:
+                print(result)
+                return
+            labels, records = result
+            stop = None if limit is None else offset + limit
+            display_table(islice(records, offset, stop), labels)
+            return
+        
+        success, result_data = select(
+            metadata, table_name, plan["where"], limit, offset, prepared=prepared,
+            order_by=plan["order_by"],
+        )
+        if not success:
+            print(result_data)  # В этом случае result_data содержит сообщение об ошибке
+            return
+        
+        # Записи выводятся страницами по мере их нахождения
+        columns = metadata[table_name]["columns"]
+        if items:
+            columns = [item[1] for item in items]
+            success, message = check_columns(metadata, table_name, columns)
+            if not success:
+                print(message)
+                return
+        display_table(result_data, columns)
 
-def run():
+def parse_values_list(values_str):
     """
-    Основной цикл программы для работы с базой данных.
+    Парсит список значений в формате (value1, value2, value3) или value1 value2.
+    Значение в кавычках всегда строка: параметр подготовленной команды -
+    только ? без кавычек.
     """
-    print("***Операции с данными***")
-    print_help()
+    tokens, error = tokenize(values_str)
+    if error:
+        raise ValueError(error)
+    # Скобки и запятые только разделяют значения
+    return [parse_literal(token) for token in tokens if token.kind != "punct"]
+
+# Режимы замера команд: \timing on|off и \profile on [файл]|off
+_timing = False
+_profile = None  # None - профилирование выключено, иначе {"path": файл или None}
+
+def execute(user_input):
+    """
+    Выполняет одну команду и печатает ее результат.
+    Используется интерактивным циклом и сервером.
+    Возвращает False, если после команды работу нужно завершить.
+    """
+    stripped = user_input.strip()
+    if stripped.startswith("\\"):
+        return _execute_setting(stripped[1:])
     
-    while True:
+    # explain analyze <команда> - замер одной команды
+    parts = stripped.split(None, 2)
+    if [part.lower() for part in parts[:2]] == ["explain", "analyze"]:
+        if len(parts) < 3:
+            print("Ошибка: Не указана команда. Используйте: explain analyze <команда>")
+            return True
+        return _execute_measured(parts[2])
+    
+    if _timing:
+        return _execute_measured(user_input)
+    return _execute_profiled(user_input)
+
+def _execute_setting(setting):
+    """Переключает режимы замера: \\timing on|off, \\profile on [файл]|off"""
+    global _timing, _profile
+    parts = setting.split()
+    name = parts[0].lower() if parts else ""
+    mode = parts[1].lower() if len(parts) >= 2 else None
+    
+    if name == "timing" and len(parts) == 2 and mode in ("on", "off"):
+        _timing = mode == "on"
+        print(f'Замер времени команд {"включен" if _timing else "выключен"}.')
+    elif name == "profile" and mode == "on" and len(parts) <= 3:
+        _profile = {"path": parts[2] if len(parts) == 3 else None}
+        print("Профилирование команд включено.")
+    elif name == "profile" and mode == "off" and len(parts) == 2:
+        _profile = None
+        print("Профилирование команд выключено.")
+    else:
+        print("Ошибка: Используйте \\timing on|off или \\profile on [<файл>]|off")
+    return True
+
+def _execute_measured(user_input):
+    """Выполняет команду и печатает время по фазам и счетчики"""
+    begin_measurement()
+    try:
+        result = _execute_profiled(user_input)
+    finally:
+        measurement = end_measurement()
+    print(format_report(measurement))
+    return result
+
+def _execute_profiled(user_input):
+    """Выполняет команду, при включенном профилировании - под cProfile"""
+    if _profile is not None:
+        return run_profiled(_execute_command, user_input, path=_profile["path"])
+    return _execute_command(user_input)
+
+def _execute_command(user_input):
+    """Разбирает и выполняет одну команду базы данных"""
+    schema_lock = None
+    try:
+        # Загружаем актуальные метаданные
         try:
-            # Загружаем актуальные метаданные
             metadata = load_metadata()
+        except StorageError as e:
+            # Продолжать работу с поврежденными метаданными нельзя:
+            # следующее сохранение затерло бы описание всех таблиц
+            print(f"Ошибка: {e}")
+            return False
+        
+        # Команды работы с записями выполняются по плану, а повторные
+        # команды берут уже разобранный план из кэша
+        plan, error = lookup_plan(user_input)
+        if error:
+            print(error)
+            return True
+        if plan is not None:
+            if plan["parameters"]:
+                print("Ошибка: Параметры ? можно использовать только в prepare")
+                return True
+            run_plan(metadata, plan)
+            return True
+        
+        command_parts = shlex.split(user_input)
+        
+        if not command_parts:
+            return True
+        
+        command = command_parts[0].lower()
+        args = command_parts[1:]
+        
+        # Изменения схемы другими процессами не должны затереть друг друга:
+        # метаданные перечитываются и сохраняются под блокировкой
+        if command in SCHEMA_COMMANDS:
+            schema_lock = metadata_lock_path()
+            acquire(schema_lock, exclusive=True)
+            metadata = load_metadata()
+        
+        # Обработка команд
+        if command == "exit":
+            if rollback_transaction():
+                print("Незафиксированная транзакция отменена.")
+            print("Выход из программы...")
+            return False
             
-            # Получаем команду от пользователя
-            user_input = prompt.string("Введите команду: ")
-            command_parts = shlex.split(user_input)
+        elif command == "help":
+            print_help()
             
-            if not command_parts:
-                continue
+        elif command in ("begin", "commit", "rollback") and not args:
+            action = {"begin": begin, "commit": commit, "rollback": rollback}[command]
+            success, message = action()
+            print(message)
             
-            command = command_parts[0].lower()
-            args = command_parts[1:]
+        elif command == "create_table":
+            if len(args) < 2:
+                print(
+                    "Ошибка: Недостаточно аргументов. "
+                    "Используйте: create_table <имя_таблицы> <столбец1:тип> ..."
+                )
+                return True
             
-            # Обработка команд
-            if command == "exit":
-                print("Выход из программы...")
-                break
-                
-            elif command == "help":
-                print_help()
-                
-            elif command == "create_table":
-                if len(args) < 2:
-                    print("Ошибка: Недостаточно аргументов. Используйте: create_table <имя_таблицы> <столбец1:тип> ...")
-                    continue
-                
-                table_name = args[0]
-                columns = args[1:]
+            table_name = args[0]
+            columns = args[1:]
+            storage = "json"
+            
+            # create_table users name:str using columnar
+            if len(columns) >= 2 and columns[-2].lower() == "using":
+                storage = columns[-1].lower()
+                columns = columns[:-2]
+            
+            success, message = create_table(metadata, table_name, columns, storage)
+            print(message)
+            
+            if success:
+                save_metadata(metadata)
                 
-                success, message = create_table(metadata, table_name, columns)
-                print(message)
+        elif command == "convert_table":
+            if len(args) != 2:
+                print(
+                    "Ошибка: Неверное количество аргументов. "
+                    "Используйте: convert_table <имя_таблицы> <json|columnar>"
+                )
+                return True
+            
+            table_name = args[0]
+            storage = args[1].lower()
+            success, message = convert_table(metadata, table_name, storage)
+            print(message)
+            
+            if success:
+                save_metadata(metadata)
                 
-                if success:
-                    save_metadata(metadata)
-                    
-            elif command == "drop_table":
-                if len(args) != 1:
-                    print("Ошибка: Неверное количество аргументов. Используйте: drop_table <имя_таблицы>")
-                    continue
+        elif command == "drop_table":
+            if len(args) != 1:
+                print(
+                    "Ошибка: Неверное количество аргументов. "
+                    "Используйте: drop_table <имя_таблицы>"
+                )
+                return True
+            
+            table_name = args[0]
+            success, message = drop_table(metadata, table_name)
+            print(message)
+            
+            if success:
+                save_metadata(metadata)
                 
-                table_name = args[0]
-                success, message = drop_table(metadata, table_name)
-                print(message)
+        elif command == "create_index":
+            if len(args) != 2:
+                print(
+                    "Ошибка: Неверное количество аргументов. "
+                    "Используйте: create_index <имя_таблицы> <столбец>"
+                )
+                return True
+            
+            table_name, column = args
+            success, message = create_index(metadata, table_name, column)
+            print(message)
+            
+            if success:
+                save_metadata(metadata)
                 
-                if success:
-                    save_metadata(metadata)
-                    
-            elif command == "list_tables":
-                result = list_tables(metadata)
-                print(result)
+        elif command == "list_tables":
+            result = list_tables(metadata)
+            print(result)
 
-            # ========== CRUD КОМАНДЫ ==========
-                
-            elif command == "insert" and len(args) >= 4 and args[0] == "into":
-                # Ищем индекс "values"
-                values_index = -1
-                for i, arg in enumerate(args):
-                    if arg.lower() == "values":
-                        values_index = i
-                        break
-                
-                if values_index == -1:
-                    print("Ошибка: Отсутствует ключевое слово 'values'")
-                    continue
-                
-                table_name = args[1]
-                values_str = " ".join(args[values_index+1:])
-                values = parse_values_list(values_str)
-                
-                success, message = insert(metadata, table_name, values)
-                print(message)
-                
-            elif command == "select" and len(args) >= 2 and args[0] == "from":
-                # select from users
-                # select from users where age=25
-                table_name = args[1]
-                
-                if len(args) > 2 and args[2] == "where":
-                    where_str = " ".join(args[3:])
-                    where_clause, error = parse_where_condition(where_str)
-                    if error:
-                        print(f"Ошибка: {error}")
-                        continue
-                else:
-                    where_clause = None
-                
-                success, result_data = select(metadata, table_name, where_clause)
-                if success:
-                    if result_data:
-                        columns = metadata[table_name]["columns"]
-                        display_table(result_data, columns)
-                    else:
-                        print("Нет данных для отображения")
-                else:
-                    print(result_data)  # В этом случае result_data содержит сообщение об ошибке
-                    
-            elif command == "update" and len(args) >= 5 and "set" in args and "where" in args:
-                # update users set age=26 where name="John"
-                table_name = args[0]
-                set_index = args.index("set")
-                where_index = args.index("where")
-                
-                set_str = " ".join(args[set_index+1:where_index])
-                where_str = " ".join(args[where_index+1:])
-                
-                set_clause, set_error = parse_set_clause(set_str)
-                where_clause, where_error = parse_where_condition(where_str)
-                
-                if set_error:
-                    print(f"Ошибка в SET: {set_error}")
-                    continue
-                if where_error:
-                    print(f"Ошибка в WHERE: {where_error}")
-                    continue
-                
-                success, message = update(metadata, table_name, set_clause, where_clause)
-                print(message)
-                
-            elif command == "delete" and len(args) >= 4 and args[0] == "from" and args[2] == "where":
-                # delete from users where ID=1
-                table_name = args[1]
-                where_str = " ".join(args[3:])
-                
-                where_clause, error = parse_where_condition(where_str)
-                if error:
-                    print(f"Ошибка: {error}")
-                    continue
-                
-                success, message = delete(metadata, table_name, where_clause)
-                print(message)
-                
-            elif command == "info":
-                if len(args) != 1:
-                    print("Ошибка: Неверное количество аргументов. Используйте: info <имя_таблицы>")
-                    continue
-                
-                table_name = args[0]
-                success, message = info(metadata, table_name)
-                print(message)
-                
-            else:
-                print(f"Функции '{command}' нет. Попробуйте снова или вызовите справку.")
-                
+        # ========== CRUD КОМАНДЫ ==========
+            
+        elif command == "load" and len(args) == 3 and args[1].lower() == "from":
+            # load users from users.csv
+            table_name = args[0]
+            success, message = bulk_load(metadata, table_name, args[2])
+            print(message)
+            
+        elif command == "prepare":
+            # prepare find_user as select from users where name = ?
+            parts = user_input.split(None, 3)
+            if len(parts) < 4 or parts[2].lower() != "as":
+                print("Ошибка: Используйте: prepare <имя> as <команда с параметрами ?>")
+                return True
+            
+            plan, error = parse_plan(parts[3])
+            if error:
+                print(error)
+                return True
+            if plan is None:
+                print(
+                    "Ошибка: Подготовить можно только команды "
+                    "insert, select, update и delete"
+                )
+                return True
+            _prepared[parts[1]] = plan
+            print(
+                f'Команда "{parts[1]}" подготовлена '
+                f'(параметров: {plan["parameters"]}).'
+            )
+            
+        elif command == "execute" and args:
+            # execute find_user ("Bob")
+            parts = user_input.split(None, 2)
+            name = parts[1]
+            plan = _prepared.get(name)
+            if plan is None:
+                print(f'Ошибка: Подготовленной команды "{name}" нет')
+                return True
+            
+            values, error = parse_parameters(parts[2] if len(parts) > 2 else "")
+            if error:
+                print(f"Ошибка: {error}")
+                return True
+            if len(values) != plan["parameters"]:
+                print(
+                    f'Ошибка: Ожидается параметров: {plan["parameters"]}, '
+                    f'получено: {len(values)}'
+                )
+                return True
+            run_plan(metadata, bind_parameters(plan, values))
+            
+        elif command == "analyze":
+            if len(args) != 1:
+                print(
+                    "Ошибка: Неверное количество аргументов. "
+                    "Используйте: analyze <имя_таблицы>"
+                )
+                return True
+            
+            success, message = analyze(metadata, args[0])
+            print(message)
+            
+        elif command == "info":
+            if len(args) != 1:
+                print(
+                    "Ошибка: Неверное количество аргументов. "
+                    "Используйте: info <имя_таблицы>"
+                )
+                return True
+            
+            table_name = args[0]
+            success, message = info(metadata, table_name)
+            print(message)
+            
+        else:
+            print(f"Функции '{command}' нет. Попробуйте снова или вызовите справку.")
+            
+    except Exception as e:
+        print(f"Произошла ошибка: {e}")
+        print("Попробуйте снова.")
+    finally:
+        if schema_lock is not None:
+            release(schema_lock)
+    return True
+
+def run():
+    """
+    Основной цикл программы для работы с базой данных.
+    """
+    # prompt нужен только интерактивному режиму: однократные команды (-c)
+    # и пакетный режим не платят за его импорт при запуске
+    import prompt
+
+    print("***Операции с данными***")
+    print_help()
+    
+    # Завершаем фиксацию транзакции, прерванную сбоем
+    try:
+        if recover_transaction():
+            print("Восстановлена транзакция, фиксация которой была прервана.")
+    except StorageError as e:
+        print(f"Ошибка: {e}")
+        return
+    
+    while True:
+        try:
+            # Получаем команду от пользователя
+            user_input = prompt.string("Введите команду: ")
+            if not execute(user_input):
+                break
         except KeyboardInterrupt:
+            if in_transaction():
+                rollback_transaction()
+                print("\nНезафиксированная транзакция отменена.")
             print("\nВыход из программы...")
             break
-        except Exception as e:
-            print(f"Произошла ошибка: {e}")
-            print("Попробуйте снова.")
\ No newline at end of file
+
+def run_commands(commands):
+    """
+    Однократный запуск (project -c): выполняет команды по очереди без
+    приглашения и справки. Загружаются только метаданные и таблицы,
+    к которым обращаются сами команды.
+    """
+    # Завершаем фиксацию транзакции, прерванную сбоем
+    try:
+        if recover_transaction():
+            print("Восстановлена транзакция, фиксация которой была прервана.")
+    except StorageError as e:
+        print(f"Ошибка: {e}")
+        return
+    
+    for command in commands:
+        if not execute(command):
+            return
+    if rollback_transaction():
+        print("Незафиксированная транзакция отменена.")
+
+def _script_command(line):
+    """Команда из строки скрипта или None для пустых строк и комментариев"""
+    command = line.strip()
+    if not command or command.startswith(("--", "#")):
+        return None
+    # Точка с запятой в конце команды допускается, как в SQL-скриптах
+    return command[:-1].rstrip() if command.endswith(";") else command
+
+def _commit_batch():
+    """Фиксирует пачку команд записи пакетного режима"""
+    if not commit_transaction():
+        print("Ошибка: Не удалось зафиксировать изменения.")
+
+def run_batch(lines):
+    """
+    Пакетный режим: выполняет команды из lines (файл скрипта или stdin)
+    без приглашения и справки. Подряд идущие insert, update и delete
+    выполняются одной транзакцией (до config.BATCH_COMMIT_MAX команд):
+    изменения каждой таблицы попадают в ее журнал одной дозаписью,
+    а метаданные и таблицы остаются в памяти между командами.
+    Внутри транзакции, открытой самим скриптом (begin), команды
+    выполняются как есть.
+    """
+    # Завершаем фиксацию транзакции, прерванную сбоем
+    try:
+        if recover_transaction():
+            print("Восстановлена транзакция, фиксация которой была прервана.")
+    except StorageError as e:
+        print(f"Ошибка: {e}")
+        return
+    
+    batched = None  # Число команд в текущей пачке или None, если пачки нет
+    try:
+        for line in lines:
+            command = _script_command(line)
+            if command is None:
+                continue
+            
+            is_write = command.split(None, 1)[0].lower() in WRITE_COMMANDS
+            if batched is not None and (
+                not is_write or batched >= config.BATCH_COMMIT_MAX
+            ):
+                _commit_batch()
+                batched = None
+            if is_write and batched is None and not in_transaction():
+                begin_transaction()
+                batched = 0
+            if batched is not None:
+                batched += 1
+            
+            if not execute(command):
+                break
+        
+        if batched is not None:
+            _commit_batch()
+    except KeyboardInterrupt:
+        if in_transaction():
+            rollback_transaction()
+            print("\nНезафиксированная транзакция отменена.")
+
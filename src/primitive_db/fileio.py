@@ -0,0 +1,111 @@
+"""
+Надежная запись файлов.
+
+Файлы целиком заменяются атомарно: данные пишутся во временный файл,
+сбрасываются на диск (fsync) и переименовываются поверх старого.
+При сбое на диске остается либо старая, либо новая версия файла,
+но не обрезанная.
+"""
+import os
+
+from .profiling import count
+
+
+class StorageError(Exception):
+    """Файл базы данных поврежден и не может быть прочитан"""
+
+
+def fsync_directory(directory):
+    """Сбрасывает на диск запись каталога (нужно после переименования)"""
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        # Например, в Windows каталог нельзя открыть как файл
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def atomic_write(filepath, payload, durable=True):
+    """
+    Атомарно заменяет содержимое файла (payload - str или bytes).
+    С durable=False данные не сбрасываются на диск: после сбоя может
+    остаться старая версия файла. Годится для файлов, которые можно
+    проверить и построить заново (например, статистики таблиц).
+    """
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+
+    count("bytes_written", len(payload))
+    temp_path = f"{filepath}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(payload)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, filepath)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    if durable:
+        fsync_directory(os.path.dirname(filepath))
+
+def _line_end(f):
+    """Длина открытого файла до последнего перевода строки включительно"""
+    position = f.seek(0, os.SEEK_END)
+    if position == 0:
+        return 0
+    f.seek(position - 1)
+    if f.read(1) == b"\n":
+        return position
+    while position > 0:
+        start = max(0, position - 4096)
+        f.seek(start)
+        newline = f.read(position - start).rfind(b"\n")
+        if newline != -1:
+            return start + newline + 1
+        position = start
+    return 0
+
+def line_end(filepath):
+    """
+    Длина файла строк без оборванной последней строки (следа сбоя
+    во время дозаписи); 0, если файла нет.
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            return _line_end(f)
+    except FileNotFoundError:
+        return 0
+
+def durable_append(filepath, payload, offset=None):
+    """
+    Дописывает строки в конец файла и сбрасывает их на диск.
+    Если задан offset, файл сначала обрезается до этой длины:
+    так повторная дозапись после сбоя не дублирует данные.
+    Иначе обрезается оборванная последняя строка, оставшаяся от сбоя
+    во время прошлой дозаписи: дописанные данные не должны склеиться
+    с ней в одну поврежденную строку.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+
+    count("bytes_written", len(payload))
+    created = not os.path.exists(filepath)
+    with open(filepath, 'a+b') as f:
+        if offset is None:
+            offset = _line_end(f)
+        if offset != f.seek(0, os.SEEK_END):
+            f.truncate(offset)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    if created:
+        fsync_directory(os.path.dirname(filepath))
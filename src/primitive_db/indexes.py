@@ -0,0 +1,164 @@
+import bisect
+import json
+import os
+from itertools import groupby
+from operator import itemgetter
+
+from .fileio import atomic_write
+from .profiling import count
+
+# Каталог с файлами индексов (рядом с db_meta.json)
+INDEX_DIR = "indexes"
+
+# Значение, которое больше любого ID; нужно для поиска границ диапазона
+_MAX_ID = float("inf")
+
+
+class ColumnIndex:
+    """
+    Индекс по одному столбцу таблицы.
+    Хеш-часть (значение -> {ID: запись}) отвечает на запросы на равенство за O(1),
+    отсортированная часть (пары (значение, ID)) - на запросы по диапазону
+    и упорядоченный обход за O(log n).
+    """
+
+    def __init__(self, column):
+        self.column = column
+        self.buckets = {}
+        self.sorted_keys = []
+
+    @classmethod
+    def build(cls, column, rows):
+        """Строит индекс по переданным записям"""
+        index = cls(column)
+        for row in rows:
+            value = row.get(column)
+            if value is not None:
+                index.buckets.setdefault(value, {})[row["ID"]] = row
+                index.sorted_keys.append((value, row["ID"]))
+        index.sorted_keys.sort()
+        return index
+
+    @classmethod
+    def from_entries(cls, column, entries, rows_by_id):
+        """Восстанавливает индекс из сохраненных пар [значение, ID]"""
+        index = cls(column)
+        for value, row_id in entries:
+            row = rows_by_id.get(row_id)
+            if row is None:
+                continue
+            index.buckets.setdefault(value, {})[row_id] = row
+            index.sorted_keys.append((value, row_id))
+        return index
+
+    def add(self, row):
+        """Добавляет запись в индекс"""
+        value = row.get(self.column)
+        if value is None:
+            return
+        self.buckets.setdefault(value, {})[row["ID"]] = row
+        bisect.insort(self.sorted_keys, (value, row["ID"]))
+
+    def remove(self, row):
+        """Удаляет запись из индекса (вызывается до изменения записи)"""
+        value = row.get(self.column)
+        bucket = self.buckets.get(value)
+        if bucket is None or bucket.pop(row["ID"], None) is None:
+            return
+        if not bucket:
+            del self.buckets[value]
+        key = (value, row["ID"])
+        position = bisect.bisect_left(self.sorted_keys, key)
+        if position < len(self.sorted_keys) and self.sorted_keys[position] == key:
+            del self.sorted_keys[position]
+
+    def lookup(self, value):
+        """Возвращает записи с заданным значением столбца"""
+        try:
+            bucket = self.buckets.get(value)
+        except TypeError:
+            return []
+        return list(bucket.values()) if bucket else []
+
+    def range(self, low=None, high=None, include_low=True, include_high=True):
+        """Возвращает записи со значениями из диапазона в порядке возрастания"""
+        keys = self.sorted_keys
+        if low is None:
+            start = 0
+        elif include_low:
+            start = bisect.bisect_left(keys, (low,))
+        else:
+            start = bisect.bisect_right(keys, (low, _MAX_ID))
+
+        if high is None:
+            end = len(keys)
+        elif include_high:
+            end = bisect.bisect_right(keys, (high, _MAX_ID))
+        else:
+            end = bisect.bisect_left(keys, (high,))
+
+        for value, row_id in keys[start:end]:
+            yield self.buckets[value][row_id]
+
+    def ordered(self, descending=False):
+        """
+        Возвращает записи в порядке значений столбца (записи с равными
+        значениями - по возрастанию ID). Записей без значения в индексе нет.
+        """
+        if not descending:
+            for value, row_id in self.sorted_keys:
+                yield self.buckets[value][row_id]
+            return
+        for value, keys in groupby(reversed(self.sorted_keys), key=itemgetter(0)):
+            bucket = self.buckets[value]
+            for _, row_id in reversed(list(keys)):
+                yield bucket[row_id]
+
+
+def index_path(table_name, column):
+    """Путь к файлу индекса"""
+    return os.path.join(INDEX_DIR, table_name, f"{column}.json")
+
+def save_index(table_name, index, signature):
+    """
+    Сохраняет индекс на диск вместе с сигнатурой снимка таблицы,
+    по которому он построен.
+    """
+    os.makedirs(os.path.join(INDEX_DIR, table_name), exist_ok=True)
+    try:
+        atomic_write(index_path(table_name, index.column), json.dumps(
+            {"signature": signature, "entries": index.sorted_keys},
+            ensure_ascii=False,
+        ))
+        return True
+    except Exception as e:
+        print(f"Ошибка при сохранении индекса: {e}")
+        return False
+
+def load_index(table_name, column, signature, rows_by_id):
+    """
+    Загружает индекс с диска. Возвращает None, если файла нет
+    или он построен по другой версии снимка таблицы.
+    """
+    try:
+        with open(index_path(table_name, column), 'r', encoding='utf-8') as f:
+            count("bytes_read", os.fstat(f.fileno()).st_size)
+            stored = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    # Сигнатура сравнивается в том виде, в каком она хранится в JSON
+    if signature is None:
+        return None
+    if stored.get("signature") != json.loads(json.dumps(signature)):
+        return None
+    return ColumnIndex.from_entries(column, stored["entries"], rows_by_id)
+
+def remove_indexes(table_name):
+    """Удаляет все индексы таблицы"""
+    directory = os.path.join(INDEX_DIR, table_name)
+    if not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        os.remove(os.path.join(directory, filename))
+    os.rmdir(directory)
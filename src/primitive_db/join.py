@@ -0,0 +1,45 @@
+"""
+Соединение таблиц по равенству столбцов (select ... from a join b on a.x = b.y).
+
+Записи одной таблицы (строящей) раскладываются в хеш-таблицу по значению
+столбца соединения, а записи другой (просматриваемой) проходят через нее
+потоком: каждая запись находит пары за O(1), и соединение выполняется
+за один проход по каждой таблице. Если у строящей таблицы уже есть индекс
+по столбцу соединения (или это ее первичный ключ ID), хеш-таблица
+не строится - пары берутся из индекса, и записи строящей таблицы
+не просматриваются вовсе.
+
+Пустые значения (None) ни с чем не соединяются.
+"""
+
+
+def hash_join(build, probe, build_key, probe_key):
+    """
+    Соединяет записи build и probe по build_key = probe_key.
+    Лениво выдает пары (запись probe, запись build) в порядке probe;
+    хеш-таблица по build строится при запросе первой пары.
+    """
+    table = {}
+    for row in build:
+        value = row.get(build_key)
+        if value is not None:
+            table.setdefault(value, []).append(row)
+
+    for row in probe:
+        matches = table.get(row.get(probe_key))
+        if matches:
+            for match in matches:
+                yield row, match
+
+def index_join(lookup, probe, probe_key):
+    """
+    Соединяет записи probe с записями другой таблицы, которые находит
+    lookup(значение) - поиск по индексу ее столбца соединения.
+    Выдает пары (запись probe, найденная запись).
+    """
+    for row in probe:
+        value = row.get(probe_key)
+        if value is None:
+            continue
+        for match in lookup(value):
+            yield row, match
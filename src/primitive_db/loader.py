@@ -0,0 +1,142 @@
+"""
+Потоковое чтение CSV/JSONL-файлов для массовой загрузки
+и пакетная проверка значений по столбцам.
+"""
+import csv
+import json
+import os
+from itertools import islice
+from operator import itemgetter
+
+_BOOL_VALUES = {
+    'true': True, '1': True, 'yes': True,
+    'false': False, '0': False, 'no': False,
+}
+
+
+def _read_csv(filepath, column_names):
+    """Читает CSV-файл с заголовком и выдает значения столбцов построчно"""
+    with open(filepath, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [name.strip() for name in header]
+        missing = [name for name in column_names if name not in header]
+        if missing:
+            raise ValueError(f'В заголовке CSV нет столбцов: {", ".join(missing)}')
+        pick = itemgetter(*[header.index(name) for name in column_names])
+        single = len(column_names) == 1
+        for record in reader:
+            if not record:
+                continue
+            if len(record) != len(header):
+                raise ValueError(
+                    f"Строка {reader.line_num}: ожидается {len(header)} значений"
+                )
+            yield (pick(record),) if single else pick(record)
+
+def _read_jsonl(filepath, column_names):
+    """Читает JSONL-файл (один объект на строку) и выдает значения построчно"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                raise ValueError(f"Строка {line_number}: некорректный JSON") from None
+            missing = [name for name in column_names if name not in record]
+            if missing:
+                raise ValueError(
+                    f'Строка {line_number}: нет столбцов {", ".join(missing)}'
+                )
+            yield [record[name] for name in column_names]
+
+def read_records(filepath, column_names):
+    """
+    Потоково читает записи из CSV или JSONL файла.
+    Выдает значения каждой записи в порядке column_names.
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension == ".csv":
+        return _read_csv(filepath, column_names)
+    if extension in (".jsonl", ".ndjson"):
+        return _read_jsonl(filepath, column_names)
+    raise ValueError(
+        f"Неподдерживаемый формат файла: {extension}. Ожидается .csv или .jsonl"
+    )
+
+def iter_batches(records, batch_size):
+    """Разбивает поток записей на пакеты"""
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def _to_int(value):
+    # bool в Python - подкласс int, а float приводится к int с потерей
+    # дробной части; такие значения JSONL не должны молча становиться int
+    if isinstance(value, bool) or (
+        isinstance(value, float) and not value.is_integer()
+    ):
+        raise ValueError(value)
+    return int(value)
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    return _BOOL_VALUES[str(value).strip().lower()]
+
+def _to_str(value):
+    if value is None:
+        raise ValueError(value)
+    return str(value)
+
+def _convert_int_column(values):
+    # Строки из CSV и целые числа из JSONL переводятся целиком встроенным
+    # int без вызовов Python
+    if all(type(value) in (str, int) for value in values):
+        return list(map(int, values))
+    return list(map(_to_int, values))
+
+def _convert_bool_column(values):
+    # Строки из CSV переводятся целиком через встроенные map без вызовов Python
+    if all(type(value) is str for value in values):
+        normalized = map(str.lower, map(str.strip, values))
+        return list(map(_BOOL_VALUES.__getitem__, normalized))
+    return list(map(_to_bool, values))
+
+def _convert_str_column(values):
+    if None in values:
+        raise ValueError(None)
+    return list(map(str, values))
+
+_CONVERTERS = {"int": _to_int, "bool": _to_bool, "str": _to_str}
+_COLUMN_CONVERTERS = {
+    "int": _convert_int_column,
+    "bool": _convert_bool_column,
+    "str": _convert_str_column,
+}
+
+
+def convert_column(values, col_type):
+    """
+    Приводит все значения столбца пакета к типу за один проход.
+    Возвращает (True, список значений) или (False, номер ошибочного значения).
+    """
+    try:
+        return True, _COLUMN_CONVERTERS[col_type](values)
+    except (ValueError, TypeError, KeyError):
+        pass
+
+    # Ищем первое ошибочное значение для сообщения пользователю
+    converter = _CONVERTERS[col_type]
+    for position, value in enumerate(values):
+        try:
+            converter(value)
+        except (ValueError, TypeError, KeyError):
+            return False, position
+    return False, 0
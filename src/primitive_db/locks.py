@@ -0,0 +1,128 @@
+"""
+Блокировки для одновременной работы нескольких процессов с одним каталогом.
+
+Каждой таблице соответствует файл data/<таблица>.lock, метаданным -
+db_meta.json.lock. На файл ставится блокировка fcntl.flock: разделяемая
+для чтения и исключительная для записи. Читатели одной таблицы работают
+параллельно, писатели упорядочиваются по каждой таблице отдельно.
+
+Повторная блокировка того же файла в одном процессе только увеличивает
+счетчик (flock привязан к открытому файлу, и второй дескриптор
+заблокировал бы сам процесс). Там, где fcntl недоступен (Windows),
+блокировки ничего не делают.
+"""
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from . import config
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Каталог файлов блокировок таблиц (совпадает с каталогом данных)
+LOCK_DIR = "data"
+
+# Пауза между попытками взять занятую блокировку, в секундах
+_RETRY_INTERVAL = 0.005
+
+# Блокировки процесса: путь -> [дескриптор, исключительная ли, счетчик]
+_held = {}
+
+
+class LockTimeout(Exception):
+    """Блокировку не удалось получить за отведенное время"""
+
+
+def table_lock_path(table_name):
+    """Путь к файлу блокировки таблицы"""
+    return os.path.join(LOCK_DIR, f"{table_name}.lock")
+
+def metadata_lock_path(filepath="db_meta.json"):
+    """Путь к файлу блокировки метаданных"""
+    return f"{filepath}.lock"
+
+def _flock(fd, exclusive, timeout):
+    """Ставит блокировку, ожидая ее не дольше timeout секунд"""
+    mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fcntl.flock(fd, mode | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                raise LockTimeout(
+                    "не удалось дождаться освобождения таблицы другим процессом"
+                ) from None
+            time.sleep(_RETRY_INTERVAL)
+
+def acquire(path, exclusive=False):
+    """
+    Берет блокировку файла path.
+    Если процесс уже держит разделяемую блокировку, а нужна
+    исключительная, блокировка повышается.
+    """
+    held = _held.get(path)
+    if held is not None:
+        if exclusive and not held[1]:
+            if held[0] is not None:
+                _flock(held[0], True, config.LOCK_TIMEOUT)
+            held[1] = True
+        held[2] += 1
+        return
+
+    fd = None
+    if fcntl is not None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            _flock(fd, exclusive, config.LOCK_TIMEOUT)
+        except BaseException:
+            os.close(fd)
+            raise
+    _held[path] = [fd, exclusive, 1]
+
+def release(path):
+    """Снимает блокировку файла path (после последнего вызова release)"""
+    held = _held.get(path)
+    if held is None:
+        return
+    held[2] -= 1
+    if held[2] > 0:
+        return
+    del _held[path]
+    if held[0] is not None:
+        fcntl.flock(held[0], fcntl.LOCK_UN)
+        os.close(held[0])
+
+@contextmanager
+def locked(path, exclusive=False):
+    """Блокировка файла path на время блока with"""
+    acquire(path, exclusive)
+    try:
+        yield
+    finally:
+        release(path)
+
+def table_lock(table_name, exclusive=False):
+    """Блокировка таблицы: разделяемая для чтения, исключительная для записи"""
+    return locked(table_lock_path(table_name), exclusive)
+
+def writes_table(func):
+    """
+    Декоратор операций вида func(metadata, table_name, ...), которые
+    читают и изменяют таблицу. Вся операция выполняется под исключительной
+    блокировкой таблицы, поэтому чтение счетчика ID и дозапись журнала
+    не перемежаются с записью другого процесса.
+    """
+    @wraps(func)
+    def wrapper(metadata, table_name, *args, **kwargs):
+        with table_lock(table_name, exclusive=True):
+            return func(metadata, table_name, *args, **kwargs)
+    return wrapper
@@ -1,10 +1,59 @@
 #!/usr/bin/env python3
 
-from .engine import run
+import argparse
+import sys
 
+from .engine import run, run_batch, run_commands
 
-def main():
+
+def parse_args(argv=None):
+    """Разбирает аргументы командной строки"""
+    parser = argparse.ArgumentParser(
+        prog="project", description="Примитивная база данных"
+    )
+    parser.add_argument(
+        "-c", "--command", action="append", metavar="КОМАНДА",
+        help="выполнить команду и выйти (можно указать несколько раз)",
+    )
+    commands = parser.add_subparsers(dest="mode")
+
+    serve_parser = commands.add_parser("serve", help="запустить сервер базы данных")
+    serve_parser.add_argument("--host", help="адрес TCP (по умолчанию 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, help="порт TCP (по умолчанию 8765)")
+    serve_parser.add_argument("--socket", help="путь к Unix-сокету вместо TCP")
+
+    exec_parser = commands.add_parser(
+        "exec", help="выполнить команды из файла или stdin"
+    )
+    exec_parser.add_argument(
+        "-f", "--file", help="файл с командами, по одной в строке (по умолчанию stdin)"
+    )
+
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command and args.mode is None:
+        run_commands(args.command)
+        return
+    if args.mode == "serve":
+        from .server import serve
+
+        serve(args.host, args.port, args.socket)
+        return
+    if args.mode == "exec" and args.file not in (None, "-"):
+        try:
+            with open(args.file, encoding="utf-8") as script:
+                run_batch(script)
+        except OSError as e:
+            print(f"Ошибка: не удалось прочитать файл {args.file}: {e}")
+            sys.exit(1)
+        return
+    # Команды, переданные через конвейер, выполняются в пакетном режиме
+    if args.mode == "exec" or not sys.stdin.isatty():
+        run_batch(sys.stdin)
+        return
     run()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
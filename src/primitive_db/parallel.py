@@ -0,0 +1,220 @@
+"""
+Параллельный просмотр больших таблиц в пуле процессов.
+
+Строки таблицы делятся на диапазоны по числу рабочих процессов
+(config.SCAN_WORKERS). Процессы создаются через fork и наследуют
+загруженную таблицу, отображенный в память колоночный снимок и
+скомпилированное условие, поэтому данные таблицы не сериализуются:
+в процесс передаются только границы диапазона, а обратно - номера
+подходящих строк или частичные состояния агрегатов.
+
+Там, где fork недоступен, и для небольших таблиц просмотр выполняется
+в текущем процессе.
+
+multiprocessing и concurrent.futures импортируются только при первом
+параллельном просмотре: их импорт заметно замедляет запуск программы.
+"""
+import bisect
+from itertools import chain
+
+from . import config
+from .aggregate import accumulate, finalize_groups, merge_groups
+from .columnar import ColumnarRows
+from .segments import SegmentedRows
+
+# Функция (start, stop) -> результат, которую выполняют рабочие процессы.
+# Передается им через fork, а не сериализацией.
+_task = None
+
+
+def _fork_context():
+    """Контекст multiprocessing с fork или None, если fork недоступен"""
+    import multiprocessing
+
+    try:
+        return multiprocessing.get_context("fork")
+    except ValueError:
+        return None
+
+def chunk_bounds(total, parts):
+    """Делит [0, total) на parts почти равных диапазонов"""
+    step = -(-total // parts)
+    return [(start, min(start + step, total)) for start in range(0, total, step)]
+
+def worker_count(total):
+    """
+    Число процессов для просмотра total строк (1 - без параллелизма:
+    таблица небольшая, задан один процесс или fork недоступен).
+    """
+    if total < config.PARALLEL_SCAN_MIN_ROWS or config.SCAN_WORKERS <= 1:
+        return 1
+    import multiprocessing
+
+    # Рабочие процессы пула не могут создавать собственные пулы
+    if multiprocessing.current_process().daemon or _fork_context() is None:
+        return 1
+    return config.SCAN_WORKERS
+
+def _run_chunk(bounds):
+    start, stop = bounds
+    return _task(start, stop)
+
+def map_chunks(func, total):
+    """
+    Вызывает func(start, stop) для диапазонов строк [0, total)
+    в рабочих процессах. Возвращает результаты в порядке диапазонов.
+    """
+    global _task
+    workers = worker_count(total)
+    if workers == 1:
+        return [func(0, total)]
+    from concurrent.futures import ProcessPoolExecutor
+
+    _task = func
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=_fork_context()
+        ) as pool:
+            return list(pool.map(_run_chunk, chunk_bounds(total, workers)))
+    finally:
+        _task = None
+
+
+class _ScanPart:
+    """
+    Строки одной части таблицы, доступные по номеру: для загруженной
+    таблицы (или JSON-сегмента) - список записей, для колоночной -
+    строки снимка с наложенным журналом.
+    """
+
+    def __init__(self, rows, condition, predicate):
+        self._condition = condition
+        self._predicate = predicate
+        if isinstance(rows, ColumnarRows):
+            self._columnar = rows
+            self.total = rows.snapshot_size
+        else:
+            self._columnar = None
+            self._records = list(rows.values())
+            self.total = len(self._records)
+
+    def match(self, start, stop):
+        """Номера подходящих строк из [start, stop)"""
+        if self._columnar is not None:
+            return self._columnar.match_positions(
+                self._condition, self._predicate, start, stop
+            )
+        if self._predicate is None:
+            return list(range(start, stop))
+        records = self._records
+        predicate = self._predicate
+        return [
+            position for position in range(start, stop) if predicate(records[position])
+        ]
+
+    def record(self, position):
+        """Запись по номеру строки"""
+        if self._columnar is not None:
+            return self._columnar.row_at(position)
+        return self._records[position]
+
+    def records(self, start, stop, columns):
+        """Подходящие записи из [start, stop); нужны только столбцы columns"""
+        positions = self.match(start, stop)
+        if self._columnar is not None:
+            return self._columnar.project(positions, columns, start, stop)
+        return map(self.record, positions)
+
+    def extra(self):
+        """Подходящие записи вне нумерации (новые записи колоночного журнала)"""
+        if self._columnar is None:
+            return []
+        predicate = self._predicate
+        return [
+            row for row in self._columnar.new_rows()
+            if predicate is None or predicate(row)
+        ]
+
+
+class _ScanSource:
+    """
+    Строки таблицы, доступные по сквозному номеру. Сегментированная
+    таблица нумеруется сегмент за сегментом, и каждый сегмент
+    просматривается по-своему (колоночный - векторной маской),
+    поэтому диапазон процесса может захватывать несколько сегментов.
+    """
+
+    def __init__(self, rows, condition, predicate):
+        parts = rows.parts() if isinstance(rows, SegmentedRows) else [rows]
+        self._parts = []
+        self._offsets = []
+        self.total = 0
+        for rows_part in parts:
+            part = _ScanPart(rows_part, condition, predicate)
+            self._parts.append(part)
+            self._offsets.append(self.total)
+            self.total += part.total
+
+    def _overlapping(self, start, stop):
+        """Части, попадающие в [start, stop): (смещение, часть, начало, конец)"""
+        for offset, part in zip(self._offsets, self._parts):
+            low, high = max(start, offset), min(stop, offset + part.total)
+            if low < high:
+                yield offset, part, low - offset, high - offset
+
+    def match(self, start, stop):
+        """Сквозные номера подходящих строк из [start, stop)"""
+        return [
+            offset + position
+            for offset, part, low, high in self._overlapping(start, stop)
+            for position in part.match(low, high)
+        ]
+
+    def record(self, position):
+        """Запись по сквозному номеру строки"""
+        number = bisect.bisect_right(self._offsets, position) - 1
+        return self._parts[number].record(position - self._offsets[number])
+
+    def records(self, start, stop, columns):
+        """Подходящие записи из [start, stop); нужны только столбцы columns"""
+        return chain.from_iterable(
+            part.records(low, high, columns)
+            for _, part, low, high in self._overlapping(start, stop)
+        )
+
+    def extra(self):
+        """Подходящие записи вне нумерации (новые записи колоночного журнала)"""
+        return [row for part in self._parts for row in part.extra()]
+
+
+def scan(rows, condition, predicate):
+    """
+    Находит записи, удовлетворяющие условию, проверяя части таблицы
+    параллельно. Возвращает список записей в порядке хранения.
+    """
+    source = _ScanSource(rows, condition, predicate)
+    parts = map_chunks(source.match, source.total)
+    result = [source.record(position) for part in parts for position in part]
+    result.extend(source.extra())
+    return result
+
+def aggregate(rows, condition, predicate, items, group_by=None):
+    """
+    Вычисляет агрегаты параллельно: каждый процесс накапливает состояния
+    по своей части таблицы, затем состояния объединяются.
+    Результат такой же, как у aggregate.aggregate.
+    """
+    source = _ScanSource(rows, condition, predicate)
+    columns = [column for _, _, column in items if column is not None]
+    if group_by is not None:
+        columns.append(group_by)
+    columns = list(dict.fromkeys(columns))
+
+    def accumulate_chunk(start, stop):
+        return accumulate(source.records(start, stop, columns), items, group_by)
+
+    groups = {}
+    for part in map_chunks(accumulate_chunk, source.total):
+        merge_groups(groups, part)
+    merge_groups(groups, accumulate(source.extra(), items, group_by))
+    return finalize_groups(groups, items, group_by)
@@ -0,0 +1,193 @@
+"""
+Замеры выполнения команд: режим \\timing и explain analyze.
+
+Пока идет замер команды, модули базы отмечают фазы (phase), счетчики
+(count) и признаки (mark). Время фаз считается без вложенных фаз:
+время загрузки таблицы внутри поиска относится к загрузке, а не
+к поиску. Вне замера все функции модуля ничего не делают.
+
+Отдельно run_profiled выполняет команду под cProfile.
+"""
+import functools
+from contextlib import contextmanager
+from time import perf_counter
+
+# Названия фаз в отчете
+PHASE_LABELS = {
+    "command": "разбор и прочее",
+    "load_metadata": "метаданные",
+    "load_table": "загрузка таблицы",
+    "scan": "поиск записей",
+    "sort": "сортировка",
+    "validate": "проверка значений",
+    "write": "запись",
+    "compact": "уплотнение",
+    "display": "вывод",
+}
+
+# Замер текущей команды или None, если замер не идет
+_measurement = None
+
+
+def begin():
+    """Начинает замер команды"""
+    global _measurement
+    now = perf_counter()
+    _measurement = {
+        "started": now,
+        "mark": now,
+        "stack": ["command"],
+        "phases": {},
+        "counters": {},
+        "marks": {},
+    }
+
+def end():
+    """Заканчивает замер и возвращает его результат"""
+    global _measurement
+    measurement = _measurement
+    _measurement = None
+    now = perf_counter()
+    _charge(measurement, now)
+    measurement["total"] = now - measurement["started"]
+    return measurement
+
+def _charge(measurement, now):
+    """Относит прошедшее время к текущей (верхней) фазе"""
+    phases = measurement["phases"]
+    name = measurement["stack"][-1]
+    phases[name] = phases.get(name, 0.0) + now - measurement["mark"]
+    measurement["mark"] = now
+
+@contextmanager
+def phase(name):
+    """Фаза выполнения команды"""
+    measurement = _measurement
+    if measurement is None:
+        yield
+        return
+    _charge(measurement, perf_counter())
+    measurement["stack"].append(name)
+    try:
+        yield
+    finally:
+        _charge(measurement, perf_counter())
+        measurement["stack"].pop()
+
+def timed(name):
+    """Декоратор: вызов функции - фаза name (вне замера без накладных расходов)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _measurement is None:
+                return func(*args, **kwargs)
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(name, amount=1):
+    """Увеличивает счетчик замера (строки, байты, попадания в кэш)"""
+    if _measurement is not None:
+        counters = _measurement["counters"]
+        counters[name] = counters.get(name, 0) + amount
+
+def mark(name, value):
+    """Запоминает признак выполнения (например, какой индекс использован)"""
+    if _measurement is not None:
+        _measurement["marks"][name] = value
+
+def iterate(name, iterable, counter=None):
+    """
+    Оборачивает ленивый результат: время получения каждого элемента
+    относится к фазе name, число элементов - к счетчику counter.
+    """
+    if _measurement is None:
+        return iterable
+    return _iterate(name, iter(iterable), counter)
+
+def _iterate(name, iterator, counter):
+    while True:
+        with phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        if counter is not None:
+            count(counter)
+        yield item
+
+def _format_bytes(size):
+    for unit in ("Б", "КБ", "МБ"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "Б" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} ГБ"
+
+def format_report(measurement):
+    """Текст отчета о замере команды"""
+    phases = ", ".join(
+        f"{PHASE_LABELS.get(name, name)} {seconds * 1000:.3f} мс"
+        for name, seconds in sorted(
+            measurement["phases"].items(), key=lambda item: -item[1]
+        )
+        if seconds > 0
+    )
+    counters = measurement["counters"]
+    marks = measurement["marks"]
+    lines = [f'Время: {measurement["total"] * 1000:.3f} мс ({phases})']
+
+    if "rows_scanned" in counters or "rows_returned" in counters:
+        lines.append(
+            f'Строк просмотрено: {counters.get("rows_scanned", 0)}, '
+            f'возвращено: {counters.get("rows_returned", 0)}'
+        )
+    if "segments_read" in counters or "segments_skipped" in counters:
+        lines.append(
+            f'Сегментов прочитано: {counters.get("segments_read", 0)}, '
+            f'пропущено: {counters.get("segments_skipped", 0)}'
+        )
+    if "plan" in marks:
+        lines.append(f'План команды: {marks["plan"]}')
+    if "index" in marks:
+        lines.append(f'Индекс: {marks["index"] or "нет (полный просмотр)"}')
+    if "join" in marks:
+        lines.append(f'Соединение: {marks["join"]}')
+    if "order" in marks:
+        lines.append(f'Сортировка: {marks["order"]}')
+    if marks.get("parallel"):
+        lines.append(f'Параллельный просмотр: {marks["parallel"]} процессов')
+    if "cache_hits" in counters or "cache_misses" in counters:
+        lines.append(
+            f'Кэш таблиц: попаданий {counters.get("cache_hits", 0)}, '
+            f'промахов {counters.get("cache_misses", 0)}'
+        )
+    lines.append(
+        f'Прочитано: {_format_bytes(counters.get("bytes_read", 0))}, '
+        f'записано: {_format_bytes(counters.get("bytes_written", 0))}'
+    )
+    return "\n".join(lines)
+
+def run_profiled(func, *args, path=None, limit=20):
+    """
+    Выполняет func под cProfile и печатает самые затратные функции.
+    Если задан path, полная статистика сохраняется в файл
+    (его можно открыть через pstats или snakeviz).
+    """
+    # Профилировщик нужен редко, поэтому не импортируется при запуске
+    import cProfile
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        if path is not None:
+            profiler.dump_stats(path)
+        buffer = io.StringIO()
+        stats = pstats.Stats(profiler, stream=buffer)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        print(buffer.getvalue().rstrip())
+        if path is not None:
+            print(f"Статистика профилировщика сохранена в {path}")
@@ -0,0 +1,118 @@
+"""
+Компактные записи загруженных таблиц.
+
+Вместо словаря {столбец: значение} на каждую запись хранятся только
+значения в слотах (__slots__) класса записи, а имена столбцов - один раз
+в самом классе. Класс создается по схеме таблицы (record_type) и
+кэшируется, поэтому все записи таблицы - экземпляры одного класса.
+Запись занимает в несколько раз меньше памяти, чем словарь.
+
+Запись читается и меняется как словарь (record["age"], get, in, keys,
+items, update), поэтому остальной код работает с ней так же, как
+с записями из журнала или LazyRow. Скомпилированные условия WHERE
+обращаются к слотам напрямую как к атрибутам (см. where.compile_condition),
+это быстрее обращения по имени столбца.
+"""
+from functools import lru_cache
+
+
+class Record:
+    """Запись таблицы: значения столбцов в слотах _0, _1, ..."""
+
+    __slots__ = ()
+
+    # Имена столбцов по порядку и соответствие столбец -> имя слота;
+    # задаются в классе, созданном record_type
+    columns = ()
+    slots = {}
+
+    @classmethod
+    def from_dict(cls, row):
+        """Запись из словаря {столбец: значение} (нет столбца - None)"""
+        return cls(*map(row.get, cls.columns))
+
+    def __getitem__(self, column):
+        return getattr(self, self.slots[column])
+
+    def __setitem__(self, column, value):
+        setattr(self, self.slots[column], value)
+
+    def __contains__(self, column):
+        return column in self.slots
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Record({self.to_dict()!r})"
+
+    def get(self, column, default=None):
+        slot = self.slots.get(column)
+        if slot is None:
+            return default
+        return getattr(self, slot)
+
+    def keys(self):
+        return list(self.columns)
+
+    def values(self):
+        return [getattr(self, slot) for slot in self.__slots__]
+
+    def items(self):
+        return list(zip(self.columns, self.values()))
+
+    def update(self, changes):
+        """Меняет значения столбцов на месте, как dict.update"""
+        for column, value in changes.items():
+            setattr(self, self.slots[column], value)
+
+    def to_dict(self):
+        """Запись в виде словаря (для JSON)"""
+        return dict(zip(self.columns, self.values()))
+
+
+@lru_cache(maxsize=None)
+def _record_class(columns):
+    slots = tuple(f"_{position}" for position in range(len(columns)))
+    # Конструктор с позиционными аргументами по числу столбцов:
+    # присваивание слотов без цикла заметно быстрее при загрузке таблиц
+    source = f"def __init__(self, {', '.join(slots)}):\n" + "".join(
+        f"    self.{slot} = {slot}\n" for slot in slots
+    )
+    namespace = {}
+    exec(source, namespace)
+    return type("Record", (Record,), {
+        "__slots__": slots,
+        "__init__": namespace["__init__"],
+        "columns": columns,
+        "slots": dict(zip(columns, slots)),
+    })
+
+def record_type(columns):
+    """
+    Класс записи для схемы таблицы (columns - {столбец: тип} или имена
+    столбцов). Для одной и той же схемы возвращается один и тот же класс.
+    Без схемы возвращает None: записи остаются словарями.
+    """
+    if not columns:
+        return None
+    return _record_class(tuple(columns))
+
+def to_dict(row):
+    """
+    Запись в виде словаря: словарь - как есть, для Record (и LazyRow
+    колоночных таблиц) - копия значений.
+    """
+    if isinstance(row, dict):
+        return row
+    return row.to_dict()
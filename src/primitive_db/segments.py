@@ -0,0 +1,88 @@
+"""
+Сегменты таблиц.
+
+Снимок таблицы делится на файлы data/<таблица>/<n>.<формат> по диапазонам
+ID: сегмент n хранит записи с ID от n*S+1 до (n+1)*S, где S - число
+segment_rows из описания таблицы. Новые ID только растут, поэтому вставки
+попадают в последний сегмент, а уплотнение журнала переписывает лишь
+сегменты, записи которых менялись.
+
+Для каждого сегмента в метаданных хранится статистика: число записей
+и минимум/максимум каждого столбца. По ней запрос пропускает сегменты,
+в которых подходящих записей быть не может.
+"""
+from itertools import chain
+
+from .where import may_match
+
+
+def segment_of(row_id, segment_rows):
+    """Номер сегмента записи с заданным ID"""
+    return (row_id - 1) // segment_rows
+
+def entry_segments(entry, segment_rows):
+    """Номера сегментов, которых касается запись журнала"""
+    if entry.get("op") == "insert":
+        return {segment_of(entry["row"]["ID"], segment_rows)}
+    return {segment_of(row_id, segment_rows) for row_id in entry.get("ids", ())}
+
+def split_entry(entry, segment_rows):
+    """Делит запись журнала на части по сегментам: {номер: запись}"""
+    if entry.get("op") == "insert":
+        return {segment_of(entry["row"]["ID"], segment_rows): entry}
+
+    parts = {}
+    for row_id in entry["ids"]:
+        parts.setdefault(segment_of(row_id, segment_rows), []).append(row_id)
+    return {number: {**entry, "ids": ids} for number, ids in parts.items()}
+
+def segment_stats(rows, columns):
+    """Статистика сегмента: число записей, минимумы и максимумы столбцов"""
+    stats = {"rows": len(rows), "min": {}, "max": {}}
+    if not rows:
+        return stats
+    for column in columns:
+        values = [row[column] for row in rows if column in row]
+        if values:
+            stats["min"][column] = min(values)
+            stats["max"][column] = max(values)
+    return stats
+
+def segment_may_match(stats, condition):
+    """
+    Может ли в сегменте быть запись, удовлетворяющая условию.
+    Без статистики сегмент всегда читается.
+    """
+    if stats is None or condition is None:
+        return True
+    if stats["rows"] == 0:
+        return False
+    return may_match(condition, stats["min"], stats["max"])
+
+
+class SegmentedRows:
+    """
+    Записи сегментированной таблицы для чтения: набор сегментов
+    ({номер: записи сегмента}), каждый из которых поддерживает get,
+    values и len. Запись по ID ищется только в ее сегменте.
+    """
+
+    def __init__(self, parts, segment_rows):
+        self._parts = dict(sorted(parts.items()))
+        self._segment_rows = segment_rows
+
+    def get(self, row_id, default=None):
+        part = self._parts.get(segment_of(row_id, self._segment_rows))
+        if part is None:
+            return default
+        return part.get(row_id, default)
+
+    def values(self):
+        return chain.from_iterable(part.values() for part in self._parts.values())
+
+    def parts(self):
+        """Записи сегментов в порядке их номеров"""
+        return list(self._parts.values())
+
+    def __len__(self):
+        return sum(len(part) for part in self._parts.values())
@@ -0,0 +1,159 @@
+"""
+Режим сервера: команды базы данных по локальному сокету.
+
+Сервер работает в одном процессе на asyncio, поэтому загруженные
+таблицы и метаданные остаются в памяти между запросами. Протокол -
+JSON-строки: запрос {"command": "<команда>"}, ответ {"output": "<вывод>"}.
+
+Команды записи (insert, update, delete) от разных клиентов копятся
+несколько миллисекунд и выполняются одной транзакцией: вся группа
+фиксируется одной записью в журнал каждой таблицы (групповая фиксация).
+"""
+import asyncio
+import io
+import json
+import os
+from contextlib import redirect_stdout
+
+from . import config
+from .engine import execute
+from .fileio import StorageError
+from .utils import (
+    begin_transaction,
+    commit_transaction,
+    recover_transaction,
+    rollback_transaction,
+)
+
+# Команды, которые выполняются групповой фиксацией
+GROUP_COMMANDS = ("insert", "update", "delete")
+
+# Команды управления транзакцией: на сервере каждая команда фиксируется сама
+TRANSACTION_COMMANDS = ("begin", "commit", "rollback")
+
+
+def _capture(func, *args):
+    """Выполняет функцию и возвращает напечатанный ею текст"""
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        func(*args)
+    return buffer.getvalue()
+
+def _command_name(command):
+    """Первое слово команды в нижнем регистре"""
+    parts = command.split(None, 1)
+    return parts[0].lower() if parts else ""
+
+
+class DatabaseServer:
+    """Сервер базы данных с групповой фиксацией команд записи"""
+
+    def __init__(self):
+        # Ожидающие команды записи: (команда, future для ответа)
+        self._pending = []
+        self._has_pending = None
+
+    async def _group_commit_loop(self):
+        """Выполняет накопленные команды записи пачками в одной транзакции"""
+        while True:
+            await self._has_pending.wait()
+            if config.GROUP_COMMIT_DELAY > 0:
+                await asyncio.sleep(config.GROUP_COMMIT_DELAY)
+            self._has_pending.clear()
+
+            batch = self._pending[:config.GROUP_COMMIT_MAX]
+            del self._pending[:config.GROUP_COMMIT_MAX]
+            if self._pending:
+                self._has_pending.set()
+
+            begin_transaction()
+            try:
+                outputs = [_capture(execute, command) for command, _ in batch]
+            except BaseException:
+                rollback_transaction()
+                raise
+            buffer = io.StringIO()
+            with redirect_stdout(buffer):
+                committed = commit_transaction()
+            for (_, future), output in zip(batch, outputs):
+                if not committed:
+                    output += (
+                        buffer.getvalue() or "Не удалось зафиксировать изменения.\n"
+                    )
+                if not future.done():
+                    future.set_result(output)
+
+    async def _run_command(self, command):
+        """Выполняет одну команду клиента и возвращает ее вывод"""
+        name = _command_name(command)
+        if name in TRANSACTION_COMMANDS:
+            return "В режиме сервера каждая команда фиксируется автоматически.\n"
+        if name in GROUP_COMMANDS:
+            future = asyncio.get_running_loop().create_future()
+            self._pending.append((command, future))
+            self._has_pending.set()
+            return await future
+        return _capture(execute, command)
+
+    async def handle_client(self, reader, writer):
+        """Обслуживает одно соединение: команды выполняются по очереди"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    command = json.loads(line)["command"]
+                except (ValueError, KeyError, TypeError):
+                    output = "Ошибка: некорректный запрос.\n"
+                else:
+                    if _command_name(command) == "exit":
+                        break
+                    output = await self._run_command(command)
+
+                response = json.dumps({"output": output}, ensure_ascii=False)
+                writer.write(response.encode('utf-8') + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=None, port=None, socket_path=None):
+        """Запускает сервер на TCP-порту или Unix-сокете"""
+        self._has_pending = asyncio.Event()
+        committer = asyncio.create_task(self._group_commit_loop())
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            server = await asyncio.start_unix_server(self.handle_client, socket_path)
+            address = socket_path
+        else:
+            host = host or config.SERVER_HOST
+            port = config.SERVER_PORT if port is None else port
+            server = await asyncio.start_server(self.handle_client, host, port)
+            address = f"{host}:{port}"
+
+        print(f"Сервер базы данных запущен: {address}", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            committer.cancel()
+            if socket_path is not None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+def serve(host=None, port=None, socket_path=None):
+    """Точка входа команды project serve"""
+    try:
+        if recover_transaction():
+            print("Восстановлена транзакция, фиксация которой была прервана.")
+    except StorageError as e:
+        print(f"Ошибка: {e}")
+        return
+
+    try:
+        asyncio.run(DatabaseServer().serve(host, port, socket_path))
+    except KeyboardInterrupt:
+        print("\nСервер остановлен.")
@@ -0,0 +1,83 @@
+"""
+Сортировка результата SELECT (order by).
+
+Первые k записей (order by ... limit k) отбираются кучей размера k
+за один проход (top_k), весь результат в памяти не собирается.
+Без limit записи сортируются в памяти, пока их не больше
+config.SORT_BUFFER_ROWS; больший результат сортируется внешней
+сортировкой: отсортированные серии выгружаются во временные файлы
+и сливаются k-путевым слиянием (sort_records).
+
+Пустые значения (None) считаются больше любых других: при сортировке
+по возрастанию они идут в конце, по убыванию - в начале. Записи
+с равными значениями остаются в исходном порядке.
+"""
+import heapq
+import json
+from itertools import islice
+
+from . import config
+from .profiling import count, mark
+from .records import to_dict
+
+
+def sort_key(column):
+    """Ключ сортировки записей по столбцу (пустые значения - последними)"""
+    def key(row):
+        value = row.get(column)
+        return value is None, value
+    return key
+
+def top_k(records, key, k, descending=False):
+    """Первые k записей в порядке key (куча из k записей)"""
+    if descending:
+        return heapq.nlargest(k, records, key=key)
+    return heapq.nsmallest(k, records, key=key)
+
+def _spill(chunk):
+    """Выгружает отсортированную серию записей во временный файл"""
+    # Внешняя сортировка нужна редко, поэтому tempfile не импортируется
+    # при запуске
+    import tempfile
+
+    run = tempfile.TemporaryFile("w+", encoding="utf-8")
+    for row in chunk:
+        run.write(json.dumps(to_dict(row), ensure_ascii=False) + "\n")
+    count("rows_spilled", len(chunk))
+    run.seek(0)
+    return run
+
+def _read_run(run):
+    for line in run:
+        yield json.loads(line)
+
+def sort_records(records, key, descending=False, buffer_rows=None):
+    """
+    Лениво выдает записи в порядке key. В памяти одновременно
+    сортируется не больше buffer_rows записей (по умолчанию
+    config.SORT_BUFFER_ROWS); если записей больше, серии выгружаются
+    во временные файлы и сливаются. Записи из файлов - словари.
+    """
+    buffer_rows = max(1, buffer_rows or config.SORT_BUFFER_ROWS)
+    records = iter(records)
+    runs = []
+    try:
+        while True:
+            chunk = list(islice(records, buffer_rows))
+            chunk.sort(key=key, reverse=descending)
+            if len(chunk) < buffer_rows and not runs:
+                mark("order", "в памяти")
+                yield from chunk
+                return
+            if chunk:
+                runs.append(_spill(chunk))
+            if len(chunk) < buffer_rows:
+                break
+            # Серия уже в файле: следующая читается без нее в памяти
+            del chunk
+
+        mark("order", f"внешняя сортировка, серий: {len(runs)}")
+        yield from heapq.merge(*map(_read_run, runs), key=key, reverse=descending)
+    finally:
+        for run in runs:
+            run.close()
@@ -0,0 +1,146 @@
+"""
+Статистика таблиц для info и выбора плана запроса.
+
+Для таблицы хранится число записей, а для каждого столбца - минимум,
+максимум, число пустых значений (None), число значений True (для bool)
+и оценка числа различных значений по HyperLogLog. Статистика меняется
+вместе с записями (add_rows, remove_row), поэтому для ответа на info
+таблицу просматривать не нужно.
+
+При удалении записей минимум и максимум не сужаются, а HyperLogLog
+не умеет забывать значения: после удалений это оценки сверху.
+Точные значения дает полный пересчет collect (команда analyze).
+"""
+import math
+import zlib
+
+# Точность HyperLogLog: 2**HLL_PRECISION регистров по байту на столбец,
+# стандартная ошибка оценки около 1.04 / sqrt(2**HLL_PRECISION) = 3%
+HLL_PRECISION = 10
+_REGISTERS = 1 << HLL_PRECISION
+_REST_BITS = 32 - HLL_PRECISION
+
+
+def _hash(value):
+    """32-битный хеш значения, одинаковый во всех процессах"""
+    # Умножение на число золотого сечения перемешивает биты crc32:
+    # у близких значений иначе похожи старшие биты, а по ним выбирается регистр
+    return zlib.crc32(repr(value).encode('utf-8')) * 0x9E3779B1 & 0xFFFFFFFF
+
+def _hll_add(registers, value):
+    """Добавляет значение в регистры HyperLogLog"""
+    h = _hash(value)
+    position = h >> _REST_BITS
+    rank = _REST_BITS - (h & ((1 << _REST_BITS) - 1)).bit_length() + 1
+    if rank > registers[position]:
+        registers[position] = rank
+
+def _hll_estimate(registers):
+    """Оценка числа различных значений по регистрам HyperLogLog"""
+    m = len(registers)
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in registers)
+    zeros = registers.count(0)
+    if estimate <= 2.5 * m and zeros:
+        # Для малых множеств точнее линейный подсчет по пустым регистрам
+        return round(m * math.log(m / zeros))
+    if estimate > 2 ** 32 / 30:
+        estimate = -2 ** 32 * math.log(1 - estimate / 2 ** 32)
+    return round(estimate)
+
+def new_stats(columns):
+    """Пустая статистика для схемы columns ({столбец: тип})"""
+    stats = {"rows": 0, "columns": {}}
+    for column, col_type in columns.items():
+        column_stats = {"min": None, "max": None, "nulls": 0}
+        if col_type == "bool":
+            column_stats["true"] = 0
+        # ID уникален, число различных значений равно числу записей
+        if column != "ID":
+            column_stats["hll"] = bytearray(_REGISTERS)
+        stats["columns"][column] = column_stats
+    return stats
+
+def add_rows(stats, rows, columns=None):
+    """
+    Учитывает в статистике записи rows. columns - только эти столбцы
+    (для новых значений обновленных записей; число записей не меняется).
+    """
+    rows = list(rows)
+    if columns is None:
+        stats["rows"] += len(rows)
+    for column, column_stats in stats["columns"].items():
+        if columns is not None and column not in columns:
+            continue
+        values = [row.get(column) for row in rows]
+        present = [value for value in values if value is not None]
+        column_stats["nulls"] += len(values) - len(present)
+        if not present:
+            continue
+        low, high = min(present), max(present)
+        if column_stats["min"] is None or low < column_stats["min"]:
+            column_stats["min"] = low
+        if column_stats["max"] is None or high > column_stats["max"]:
+            column_stats["max"] = high
+        if "true" in column_stats:
+            column_stats["true"] += sum(1 for value in present if value is True)
+        registers = column_stats.get("hll")
+        if registers is not None:
+            # Повторяющиеся значения хешируются один раз
+            for value in set(present):
+                _hll_add(registers, value)
+
+def remove_row(stats, row, columns=None):
+    """
+    Убирает запись из статистики (до ее удаления или изменения).
+    Минимум, максимум и HyperLogLog остаются прежними.
+    """
+    if columns is None:
+        stats["rows"] -= 1
+    for column, column_stats in stats["columns"].items():
+        if columns is not None and column not in columns:
+            continue
+        value = row.get(column)
+        if value is None:
+            column_stats["nulls"] -= 1
+        elif value is True and "true" in column_stats:
+            column_stats["true"] -= 1
+
+def collect(rows, columns):
+    """Статистика, заново посчитанная по всем записям таблицы"""
+    stats = new_stats(columns)
+    add_rows(stats, rows)
+    return stats
+
+def distinct_count(stats, column):
+    """Оценка числа различных значений столбца"""
+    column_stats = stats["columns"][column]
+    registers = column_stats.get("hll")
+    if registers is None:
+        return stats["rows"]
+    return min(_hll_estimate(registers), stats["rows"] - column_stats["nulls"])
+
+def to_json(stats):
+    """Статистика в виде, пригодном для JSON (регистры - hex-строкой)"""
+    return {
+        "rows": stats["rows"],
+        "columns": {
+            column: {
+                key: value.hex() if key == "hll" else value
+                for key, value in column_stats.items()
+            }
+            for column, column_stats in stats["columns"].items()
+        },
+    }
+
+def from_json(data):
+    """Статистика из вида to_json"""
+    return {
+        "rows": data["rows"],
+        "columns": {
+            column: {
+                key: bytearray.fromhex(value) if key == "hll" else value
+                for key, value in column_stats.items()
+            }
+            for column, column_stats in data["columns"].items()
+        },
+    }
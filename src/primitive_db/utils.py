@@ -1,56 +1,1123 @@
+import glob
 import json
 import os
+import shutil
+from collections import OrderedDict
 
+from . import config
+from .columnar import ColumnarReader, ColumnarRows, decode_table, encode_table
+from .fileio import (
+    StorageError,
+    atomic_write,
+    durable_append,
+    fsync_directory,
+    line_end,
+)
+from .indexes import ColumnIndex, load_index, remove_indexes, save_index
+from .locks import (
+    acquire,
+    metadata_lock_path,
+    release,
+    table_lock,
+    table_lock_path,
+)
+from .profiling import count, timed
+from .records import record_type, to_dict
+from .segments import (
+    SegmentedRows,
+    entry_segments,
+    segment_may_match,
+    segment_of,
+    segment_stats,
+    split_entry,
+)
+from .stats import add_rows, collect, from_json, remove_row, to_json
 
+# Каталог с файлами таблиц
+DATA_DIR = "data"
+
+# Форматы хранения снимков таблиц и расширения их файлов
+STORAGE_JSON = "json"
+STORAGE_COLUMNAR = "columnar"
+SNAPSHOT_EXTENSIONS = {STORAGE_JSON: "json", STORAGE_COLUMNAR: "col"}
+
+# Число записей в журнале каждой таблицы (известно после загрузки)
+_log_entries = {}
+
+# Кэш загруженных таблиц: имя -> состояние таблицы (см. load_table).
+# Порядок ключей - порядок использования (LRU).
+_table_cache = OrderedDict()
+
+# Кэш метаданных: путь -> (сигнатура файла, словарь метаданных)
+_metadata_cache = {}
+
+# Журналы фиксации транзакций (redo-журналы) в каталоге data;
+# у каждого процесса свой журнал commit-<pid>.journal
+JOURNAL_PATTERN = "commit-*.journal"
+
+# Открытая транзакция: {"tables": {имя: [записи журнала]},
+# "metadata": {путь: метаданные}, "locks": [пути удерживаемых блокировок]}
+# или None
+_transaction = None
+
+
+def _file_signature(filepath):
+    """Сигнатура файла для проверки актуальности кэша: (mtime, размер)"""
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _snapshot_signature(table_name, storage=STORAGE_JSON, segment_rows=None):
+    """
+    Сигнатура снимка: (mtime, размер) файла снимка, а для сегментированной
+    таблицы - кортеж (номер, mtime, размер) по всем сегментам.
+    """
+    if not segment_rows:
+        return _file_signature(table_path(table_name, storage))
+    parts = []
+    for number in segment_numbers(table_name, storage):
+        signature = _file_signature(segment_path(table_name, number, storage))
+        if signature is not None:
+            parts.append((number, *signature))
+    return tuple(parts) or None
+
+def _table_signature(table_name, storage=STORAGE_JSON, segment_rows=None):
+    """Сигнатура таблицы: сигнатуры снимка и журнала"""
+    return (
+        _snapshot_signature(table_name, storage, segment_rows),
+        _file_signature(log_path(table_name)),
+    )
+
+def _signature_size(signature):
+    """Суммарный размер файлов таблицы по ее сигнатуре"""
+    snapshot, log = signature
+    size = log[1] if log is not None else 0
+    if snapshot is None:
+        return size
+    if isinstance(snapshot[0], tuple):
+        return size + sum(part[-1] for part in snapshot)
+    return size + snapshot[1]
+
+def _cache_table(table_name, state):
+    """Запоминает таблицу в кэше и вытесняет давно не используемые"""
+    signature = _table_signature(
+        table_name, state["storage"], state.get("segment_rows")
+    )
+    # Оценка занимаемой памяти - размер файлов таблицы на диске
+    state["signature"] = signature
+    state["size"] = _signature_size(signature)
+    _table_cache[table_name] = state
+    _table_cache.move_to_end(table_name)
+
+    # Таблицы с незафиксированными изменениями не вытесняются
+    pinned = _transaction["tables"] if _transaction is not None else {}
+    total = sum(entry["size"] for entry in _table_cache.values())
+    for name in list(_table_cache):
+        if total <= config.TABLE_CACHE_MAX_BYTES:
+            break
+        if name == table_name or name in pinned:
+            continue
+        total -= _table_cache.pop(name)["size"]
+
+def clear_cache():
+    """Очищает кэш таблиц и метаданных"""
+    _table_cache.clear()
+    _metadata_cache.clear()
+
+@timed("load_metadata")
 def load_metadata(filepath="db_meta.json"):
     """
     Загружает метаданные из JSON-файла.
     Если файл не найден, возвращает пустой словарь.
+    Пока файл не изменился, возвращается ранее разобранный словарь.
+    Внутри транзакции возвращаются незафиксированные метаданные.
+    Если файл поврежден, выбрасывается StorageError.
     """
+    if _transaction is not None and filepath in _transaction["metadata"]:
+        return _transaction["metadata"][filepath]
+
+    signature = _file_signature(filepath)
+    cached = _metadata_cache.get(filepath)
+    if cached is not None and signature is not None and cached[0] == signature:
+        return cached[1]
+
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            metadata = json.load(f)
     except FileNotFoundError:
         return {}
     except json.JSONDecodeError:
-        print("Ошибка: файл метаданных поврежден.")
-        return {}
+        raise StorageError(f"файл метаданных {filepath} поврежден") from None
+    count("bytes_read", signature[1])
+
+    _metadata_cache[filepath] = (signature, metadata)
+    return metadata
 
 def save_metadata(data, filepath="db_meta.json"):
     """
-    Сохраняет метаданные в JSON-файл.
+    Сохраняет метаданные в JSON-файл (атомарной заменой файла).
+    Внутри транзакции метаданные только запоминаются до фиксации.
     """
-    try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    if _transaction is not None:
+        if filepath not in _transaction["metadata"]:
+            _hold_lock(metadata_lock_path(filepath))
+        _transaction["metadata"][filepath] = data
         return True
+
+    try:
+        atomic_write(filepath, json.dumps(data, ensure_ascii=False, indent=2))
     except Exception as e:
+        _metadata_cache.pop(filepath, None)
         print(f"Ошибка при сохранении метаданных: {e}")
         return False
 
-def load_table_data(table_name):
-    """Загружает данные таблицы из JSON-файла"""
-    filepath = f"data/{table_name}.json"
+    _metadata_cache[filepath] = (_file_signature(filepath), data)
+    return True
+
+def table_path(table_name, storage=STORAGE_JSON):
+    """Путь к снимку таблицы в заданном формате хранения"""
+    return os.path.join(DATA_DIR, f"{table_name}.{SNAPSHOT_EXTENSIONS[storage]}")
+
+def log_path(table_name):
+    """Путь к журналу изменений таблицы"""
+    return os.path.join(DATA_DIR, f"{table_name}.log")
+
+def table_meta_path(table_name):
+    """Путь к файлу со счетчиком ID и статистикой сегментов таблицы"""
+    return os.path.join(DATA_DIR, f"{table_name}.meta")
+
+def stats_path(table_name):
+    """Путь к файлу статистики таблицы"""
+    return os.path.join(DATA_DIR, f"{table_name}.stats")
+
+def segment_path(table_name, number, storage=STORAGE_JSON):
+    """Путь к файлу сегмента таблицы"""
+    filename = f"{number}.{SNAPSHOT_EXTENSIONS[storage]}"
+    return os.path.join(DATA_DIR, table_name, filename)
+
+def segment_numbers(table_name, storage=STORAGE_JSON):
+    """Номера сегментов таблицы, файлы которых есть на диске"""
+    extension = f".{SNAPSHOT_EXTENSIONS[storage]}"
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        names = os.listdir(os.path.join(DATA_DIR, table_name))
     except FileNotFoundError:
         return []
-    except json.JSONDecodeError:
-        print(f"Ошибка: не удалось прочитать файл {table_name}.json.")
+    stems = (name[:-len(extension)] for name in names if name.endswith(extension))
+    return sorted(int(stem) for stem in stems if stem.isdigit())
+
+def _read_log(table_name, offset=0):
+    """
+    Читает записи журнала изменений таблицы, начиная с байта offset
+    (чтобы дочитать только записи, дописанные после прошлого чтения).
+    Возвращает (записи, признак оборванной последней строки).
+    Строка без перевода строки в конце - след сбоя во время дозаписи:
+    она пропускается и будет обрезана перед следующей дозаписью.
+    """
+    entries = []
+    try:
+        with open(log_path(table_name), 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return entries, False
+
+    count("bytes_read", len(data))
+    end = data.rfind(b"\n") + 1
+    lines = data[:end].decode('utf-8').splitlines()
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            entries.append(json.loads(line))
+        except json.JSONDecodeError:
+            print(f"Ошибка: повреждена строка {number} журнала {table_name}.log.")
+    return entries, end < len(data)
+
+def _apply_entry(state, entry):
+    """Применяет одну запись журнала к строкам таблицы и ее индексам"""
+    segment_rows = state.get("segment_rows")
+    if segment_rows:
+        # Сегменты с изменениями будут переписаны при уплотнении
+        state["dirty_segments"].update(entry_segments(entry, segment_rows))
+
+    rows = state["rows"]
+    indexes = state["indexes"].values()
+    stats = state.get("stats")
+    op = entry.get("op")
+
+    if op == "insert":
+        row = entry["row"]
+        # Запись журнала остается словарем, в таблицу попадает компактная копия
+        record = state.get("record")
+        if record is not None:
+            row = record.from_dict(row)
+        rows[row["ID"]] = row
+        # Счетчик только растет: ID удаленных записей не переиспользуются
+        if row["ID"] >= state["next_id"]:
+            state["next_id"] = row["ID"] + 1
+        for index in indexes:
+            index.add(row)
+        if stats is not None:
+            add_rows(stats, (row,))
+
+    elif op == "update":
+        changes = entry["set"]
+        touched = [index for index in indexes if index.column in changes]
+        for row_id in entry["ids"]:
+            row = rows.get(row_id)
+            if row is None:
+                continue
+            for index in touched:
+                index.remove(row)
+            if stats is not None:
+                remove_row(stats, row, changes)
+            row.update(changes)
+            for index in touched:
+                index.add(row)
+            if stats is not None:
+                add_rows(stats, (row,), changes)
+
+    elif op == "delete":
+        for row_id in entry["ids"]:
+            row = rows.pop(row_id, None)
+            if row is not None:
+                for index in indexes:
+                    index.remove(row)
+                if stats is not None:
+                    remove_row(stats, row)
+
+def _ensure_indexes(state, index_columns):
+    """Строит по строкам таблицы индексы, которых еще нет в состоянии"""
+    for column in index_columns:
+        if column not in state["indexes"]:
+            state["indexes"][column] = ColumnIndex.build(column, state["rows"].values())
+
+def _read_snapshot(table_name, storage, segment_rows=None, record=None):
+    """Читает снимок таблицы (все его сегменты) в виде списка записей"""
+    if not segment_rows:
+        return _read_snapshot_file(table_path(table_name, storage), storage, record)
+    rows = []
+    for number in segment_numbers(table_name, storage):
+        rows.extend(_read_snapshot_file(
+            segment_path(table_name, number, storage), storage, record
+        ))
+    return rows
+
+def _read_snapshot_file(filepath, storage, record=None):
+    """
+    Читает файл снимка или сегмента в виде списка записей.
+    record - класс записей таблицы (без него записи - словари).
+    Поврежденный файл не подменяется пустой таблицей:
+    выбрасывается StorageError.
+    """
+    try:
+        if storage == STORAGE_COLUMNAR:
+            with open(filepath, 'rb') as f:
+                data = f.read()
+            count("bytes_read", len(data))
+            return decode_table(data, record)
+        with open(filepath, 'r', encoding='utf-8') as f:
+            count("bytes_read", os.fstat(f.fileno()).st_size)
+            # Каждая запись превращается в компактную сразу при разборе,
+            # поэтому словари всех записей не хранятся одновременно
+            return json.load(f, object_hook=record.from_dict if record else None)
+    except FileNotFoundError:
         return []
+    except ValueError:
+        raise StorageError(
+            f"файл {os.path.basename(filepath)} поврежден"
+        ) from None
+
+@timed("load_table")
+def load_table(table_name, table_meta=None):
+    """
+    Загружает таблицу: снимок и журнал изменений.
+    table_meta - описание таблицы из метаданных (столбцы, индексы,
+    формат хранения, сохраненный счетчик ID).
+    Возвращает состояние таблицы - словарь с ключами
+    "rows" ({ID: запись} в порядке вставки; первичный индекс по ID),
+    "indexes" ({столбец: ColumnIndex}), "next_id" (следующий свободный ID),
+    "storage", "columns", "record" (класс записей по схеме таблицы,
+    см. records.record_type), "stats" (статистика таблицы, см. stats.py),
+    "segment_rows" (размер сегмента или None)
+    и "dirty_segments" (сегменты, измененные после уплотнения).
+    Если файлы таблицы не менялись с прошлой загрузки, состояние берется
+    из кэша без чтения диска; если другой процесс только дописал журнал,
+    дочитываются лишь новые записи.
+    Файлы читаются под разделяемой блокировкой таблицы.
+    """
+    table_meta = table_meta or {}
+    storage = table_meta.get("storage", STORAGE_JSON)
+    segment_rows = table_meta.get("segment_rows")
+    index_columns = table_meta.get("indexes", [])
+
+    with table_lock(table_name):
+        cached = _table_cache.get(table_name)
+        if (
+            cached is not None
+            and cached["storage"] == storage
+            and cached.get("segment_rows") == segment_rows
+        ):
+            signature = _table_signature(table_name, storage, segment_rows)
+            if cached["signature"] == signature or _read_log_tail(
+                table_name, cached, signature
+            ):
+                _table_cache.move_to_end(table_name)
+                _ensure_indexes(cached, index_columns)
+                count("cache_hits")
+                return cached
+        count("cache_misses")
+        return _load_table_files(table_name, table_meta)
+
+def _read_log_tail(table_name, state, signature):
+    """
+    Догоняет кэшированное состояние по журналу, если с прошлого чтения
+    снимок не менялся, а журнал только вырос. Возвращает True при успехе.
+    """
+    old_snapshot, old_log = state["signature"]
+    snapshot, log = signature
+    # После оборванной строки дочитывать нельзя: перед дозаписью ее
+    # обрезают, и новые записи начинаются раньше запомненного размера
+    if snapshot != old_snapshot or log is None or state.get("log_torn"):
+        return False
+    offset = old_log[1] if old_log is not None else 0
+    if log[1] < offset:
+        return False
+
+    entries, state["log_torn"] = _read_log(table_name, offset)
+    for entry in entries:
+        _apply_entry(state, entry)
+    _log_entries[table_name] = _log_entries.get(table_name, 0) + len(entries)
+    _cache_table(table_name, state)
+    return True
+
+def _new_state(rows, table_meta):
+    """Состояние таблицы по записям {ID: запись} и описанию из метаданных"""
+    return {
+        "rows": rows,
+        "indexes": {},
+        "next_id": max(table_meta.get("next_id", 1), max(rows, default=0) + 1),
+        "storage": table_meta.get("storage", STORAGE_JSON),
+        "columns": table_meta.get("columns"),
+        "record": record_type(table_meta.get("columns")),
+        "stats": None,
+        "snapshot_rows": len(rows),
+        "segment_rows": table_meta.get("segment_rows"),
+        "dirty_segments": set(),
+    }
+
+def _load_table_files(table_name, table_meta):
+    """Читает таблицу с диска целиком: снимок, индексы и журнал"""
+    storage = table_meta.get("storage", STORAGE_JSON)
+    segment_rows = table_meta.get("segment_rows")
+    index_columns = table_meta.get("indexes", [])
+    record = record_type(table_meta.get("columns"))
+    snapshot = _read_snapshot(table_name, storage, segment_rows, record)
+    state = _new_state(
+        {row["ID"]: row for row in snapshot}, _with_table_meta(table_name, table_meta)
+    )
+
+    # Индексы, сохраненные вместе с текущим снимком, догоняют его по журналу
+    snapshot_signature = _snapshot_signature(table_name, storage, segment_rows)
+    for column in index_columns:
+        index = load_index(table_name, column, snapshot_signature, state["rows"])
+        if index is not None:
+            state["indexes"][column] = index
+
+    entries, state["log_torn"] = _read_log(table_name)
+    for entry in entries:
+        _apply_entry(state, entry)
+    _log_entries[table_name] = len(entries)
+
+    _ensure_indexes(state, index_columns)
+    _cache_table(table_name, state)
+
+    # Статистика берется из файла, если он соответствует файлам таблицы,
+    # иначе (сбой, старая версия) считается заново по записям
+    if state["columns"]:
+        state["stats"] = _load_stats(table_name, state["signature"])
+        if state["stats"] is None:
+            state["stats"] = collect(state["rows"].values(), state["columns"])
+            _save_stats(table_name, state)
+    return state
+
+def _load_stats(table_name, signature):
+    """
+    Читает статистику таблицы. Возвращает None, если файла нет или он
+    записан для другой версии файлов таблицы.
+    """
+    try:
+        with open(stats_path(table_name), 'r', encoding='utf-8') as f:
+            count("bytes_read", os.fstat(f.fileno()).st_size)
+            stored = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    # Сигнатура сравнивается в том виде, в каком она хранится в JSON
+    if signature is None:
+        return None
+    if stored.get("signature") != json.loads(json.dumps(signature)):
+        return None
+    return from_json(stored["stats"])
+
+def _save_stats(table_name, state):
+    """
+    Сохраняет статистику таблицы вместе с сигнатурой ее файлов.
+    Файл пишется без fsync: после сбоя сигнатура не совпадет,
+    и статистика будет посчитана заново.
+    """
+    if state.get("stats") is None:
+        return
+    payload = json.dumps(
+        {"signature": state["signature"], "stats": to_json(state["stats"])},
+        ensure_ascii=False,
+    )
+    try:
+        atomic_write(stats_path(table_name), payload, durable=False)
+    except OSError:
+        pass
+
+def table_stats(table_name, table_meta=None):
+    """
+    Статистика таблицы (см. stats.py) без чтения ее записей: из кэша
+    или из файла статистики. Таблица загружается, только если файл
+    статистики устарел.
+    """
+    table_meta = table_meta or {}
+    storage = table_meta.get("storage", STORAGE_JSON)
+    segment_rows = table_meta.get("segment_rows")
+
+    with table_lock(table_name):
+        signature = _table_signature(table_name, storage, segment_rows)
+        cached = _table_cache.get(table_name)
+        if (
+            cached is not None
+            and cached["signature"] == signature
+            and cached.get("stats") is not None
+        ):
+            return cached["stats"]
+        stored = _load_stats(table_name, signature)
+        if stored is not None:
+            return stored
+    return load_table(table_name, table_meta)["stats"]
+
+def analyze_table(table_name, table_meta=None):
+    """
+    Пересчитывает статистику таблицы по всем записям: после удалений
+    минимумы, максимумы и число различных значений снова точные.
+    """
+    with table_lock(table_name, exclusive=True):
+        state = load_table(table_name, table_meta)
+        state["stats"] = collect(state["rows"].values(), state["columns"])
+        _save_stats(table_name, state)
+        return state["stats"]
+
+@timed("load_table")
+def open_table(table_name, table_meta=None, condition=None):
+    """
+    Открывает таблицу только для чтения.
+    Если таблица уже загружена, возвращается ее состояние из кэша.
+    Колоночная таблица, которой нет в кэше, не загружается целиком:
+    снимок отображается в память, и значения декодируются только при
+    обращении к ним. В этом случае индексов в состоянии нет.
+    У колоночной сегментированной таблицы, которой нет в кэше,
+    открываются только сегменты, в которых могут быть записи,
+    удовлетворяющие condition.
+    """
+    table_meta = table_meta or {}
+    storage = table_meta.get("storage", STORAGE_JSON)
+    segment_rows = table_meta.get("segment_rows")
+
+    cached = _table_cache.get(table_name)
+    signature = _table_signature(table_name, storage, segment_rows)
+    if cached is not None and cached["signature"] == signature:
+        return load_table(table_name, table_meta)
+
+    if segment_rows:
+        # JSON-сегменты выгоднее загрузить один раз и держать в кэше:
+        # иначе каждый запрос заново читал бы и разбирал их файлы.
+        # Индексы тоже есть только у загруженной таблицы
+        if storage != STORAGE_COLUMNAR:
+            return load_table(table_name, table_meta)
+        count("cache_misses")
+        return _open_segments(table_name, table_meta, condition)
+
+    filepath = table_path(table_name, storage)
+    if storage != STORAGE_COLUMNAR or not os.path.exists(filepath):
+        return load_table(table_name, table_meta)
+    count("cache_misses")
+
+    # Снимок и журнал читаются согласованно: уплотнение другим процессом
+    # не может заменить снимок между их чтением
+    with table_lock(table_name):
+        try:
+            reader = ColumnarReader(filepath)
+        except ValueError:
+            return load_table(table_name, table_meta)
+        entries, _ = _read_log(table_name)
+        return {"rows": ColumnarRows(reader, entries), "indexes": {}}
+
+def _rows_with_entries(rows, entries, record=None):
+    """Записи {ID: запись} после применения к ним записей журнала"""
+    state = {
+        "rows": {row["ID"]: row for row in rows},
+        "indexes": {},
+        "next_id": 0,
+        "record": record,
+    }
+    for entry in entries:
+        _apply_entry(state, entry)
+    return state["rows"]
+
+def _open_segments(table_name, table_meta, condition):
+    """
+    Открывает для чтения сегменты колоночной таблицы, которые по
+    статистике из метаданных могут содержать записи, удовлетворяющие
+    condition (None - все).
+    Сегменты, куда журнал вставлял или где менял записи, читаются всегда:
+    их содержимое могло разойтись со статистикой.
+    """
+    segment_rows = table_meta["segment_rows"]
+    record = record_type(table_meta.get("columns"))
+
+    with table_lock(table_name):
+        stats = _with_table_meta(table_name, table_meta).get("segments", {})
+        entries, _ = _read_log(table_name)
+        segment_entries = {}
+        changed = set()
+        for entry in entries:
+            for number, part in split_entry(entry, segment_rows).items():
+                segment_entries.setdefault(number, []).append(part)
+            if entry.get("op") != "delete":
+                changed.update(entry_segments(entry, segment_rows))
+
+        existing = segment_numbers(table_name, STORAGE_COLUMNAR)
+        parts = {}
+        for number in existing:
+            if number not in changed and not segment_may_match(
+                stats.get(str(number)), condition
+            ):
+                count("segments_skipped")
+                continue
+            count("segments_read")
+            filepath = segment_path(table_name, number, STORAGE_COLUMNAR)
+            part_entries = segment_entries.get(number, [])
+            try:
+                parts[number] = ColumnarRows(ColumnarReader(filepath), part_entries)
+            except ValueError:
+                raise StorageError(
+                    f"файл {table_name}/{os.path.basename(filepath)} поврежден"
+                ) from None
+
+        # Сегменты, которых еще нет на диске, состоят только из записей журнала
+        for number, part_entries in segment_entries.items():
+            if number not in existing:
+                parts[number] = _rows_with_entries([], part_entries, record)
+
+    # В колоночных сегментах записи читаются лениво (LazyRow), а не Record
+    return {
+        "rows": SegmentedRows(parts, segment_rows),
+        "indexes": {},
+        "record": None,
+    }
+
+def load_table_data(table_name):
+    """Загружает записи таблицы"""
+    return load_table(table_name)["rows"].values()
+
+def _write_snapshot(table_name, rows, storage=STORAGE_JSON, columns=None):
+    """Записывает снимок таблицы и удаляет ставший ненужным журнал"""
 
-def save_table_data(table_name, data):
-    """Сохраняет данные таблицы в JSON-файл"""
-    
     # Создаем директорию data, если её нет
-    os.makedirs("data", exist_ok=True)  # Добавить эту строку
+    os.makedirs(DATA_DIR, exist_ok=True)
 
-    filepath = f"data/{table_name}.json"
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)    
-        return True
+        # Снимок заменяется атомарно, поэтому сбой не обрезает таблицу
+        atomic_write(
+            table_path(table_name, storage), _encode_rows(rows, storage, columns)
+        )
     except Exception as e:
+        _table_cache.pop(table_name, None)
         print(f"Ошибка при сохранении файла: {e}")
-        return False
\ No newline at end of file
+        return False
+
+    _drop_log(table_name)
+    return True
+
+def _write_segments(table_name, groups, storage=STORAGE_JSON, columns=None):
+    """
+    Переписывает сегменты из groups ({номер: записи}) и удаляет журнал.
+    Файл опустевшего сегмента удаляется.
+    """
+    os.makedirs(os.path.join(DATA_DIR, table_name), exist_ok=True)
+
+    try:
+        for number, rows in groups.items():
+            filepath = segment_path(table_name, number, storage)
+            if rows:
+                atomic_write(filepath, _encode_rows(rows, storage, columns))
+            elif os.path.exists(filepath):
+                os.remove(filepath)
+    except Exception as e:
+        _table_cache.pop(table_name, None)
+        print(f"Ошибка при сохранении сегмента: {e}")
+        return False
+
+    _drop_log(table_name)
+    return True
+
+def _encode_rows(rows, storage, columns):
+    """Содержимое файла снимка или сегмента в заданном формате"""
+    if storage == STORAGE_COLUMNAR:
+        return encode_table(columns, rows)
+    # json.dumps без отступов использует быстрый C-кодировщик
+    return json.dumps([to_dict(row) for row in rows], ensure_ascii=False)
+
+def _drop_log(table_name):
+    """Удаляет журнал, ставший ненужным после записи снимка"""
+    try:
+        os.remove(log_path(table_name))
+    except FileNotFoundError:
+        pass
+    _log_entries[table_name] = 0
+
+def save_table_data(table_name, data, table_meta=None):
+    """
+    Сохраняет данные таблицы целиком.
+    Индексы строятся заново по новым данным.
+    """
+    table_meta = table_meta or {}
+    cached = _table_cache.get(table_name)
+    record = record_type(table_meta.get("columns"))
+    state = _new_state(
+        {row["ID"]: row for row in _to_records(data, record)},
+        _with_table_meta(table_name, table_meta),
+    )
+    if state["columns"]:
+        state["stats"] = collect(state["rows"].values(), state["columns"])
+    if cached is not None:
+        state["next_id"] = max(state["next_id"], cached["next_id"])
+    _ensure_indexes(state, table_meta.get("indexes", []))
+    _mark_all_segments(table_name, state)
+    return compact_table(table_name, state)
+
+def _to_records(rows, record):
+    """Записи в виде экземпляров класса record (без класса - как есть)"""
+    if record is None:
+        return rows
+    return [row if isinstance(row, record) else record.from_dict(row) for row in rows]
+
+def _mark_all_segments(table_name, state, storage=None):
+    """Отмечает для перезаписи все сегменты: и записанные на диск, и новые"""
+    segment_rows = state.get("segment_rows")
+    if not segment_rows:
+        return
+    dirty = state["dirty_segments"]
+    dirty.update(segment_numbers(table_name, storage or state["storage"]))
+    dirty.update(segment_of(row_id, segment_rows) for row_id in state["rows"])
+
+@timed("write")
+def write_table_changes(table_name, entries):
+    """
+    Дописывает изменения в журнал таблицы и применяет их к загруженному
+    состоянию. Стоимость записи не зависит от размера таблицы.
+    Внутри транзакции изменения применяются только к состоянию в памяти
+    и попадают на диск при фиксации.
+    """
+    if _transaction is not None:
+        if table_name not in _transaction["tables"]:
+            # Таблица остается заблокированной до конца транзакции
+            _hold_lock(table_lock_path(table_name))
+        state = load_table(table_name, load_metadata().get(table_name))
+        _transaction["tables"].setdefault(table_name, []).extend(entries)
+        for entry in entries:
+            _apply_entry(state, entry)
+        return True
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with table_lock(table_name, exclusive=True):
+        try:
+            durable_append(log_path(table_name), _log_payload(entries))
+        except Exception as e:
+            _table_cache.pop(table_name, None)
+            print(f"Ошибка при записи журнала: {e}")
+            return False
+
+        state = _table_cache.get(table_name)
+        if state is None:
+            # Таблица была вытеснена из кэша - журнал уже содержит изменения
+            return True
+        for entry in entries:
+            _apply_entry(state, entry)
+        return _log_written(table_name, state, len(entries))
+
+def _log_payload(entries):
+    """Строки журнала для записей изменений"""
+    return "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+
+def _log_written(table_name, state, count):
+    """Учитывает дописанные в журнал записи и при необходимости уплотняет его"""
+    logged = _log_entries.get(table_name, 0) + count
+    _log_entries[table_name] = logged
+
+    # Журнал уплотняется, когда число записей в нем превышает
+    # max(LOG_COMPACT_MIN_ENTRIES, размер снимка * LOG_COMPACT_RATIO).
+    # Порог растет вместе с таблицей, поэтому стоимость уплотнения
+    # в пересчете на одну запись остается O(1). Размер берется по снимку,
+    # а не по текущему числу записей: иначе каждая вставка поднимала бы
+    # порог вместе с журналом, и журнал таблицы без удалений рос бы вечно.
+    threshold = max(
+        config.LOG_COMPACT_MIN_ENTRIES,
+        state["snapshot_rows"] * config.LOG_COMPACT_RATIO,
+    )
+    if logged > threshold:
+        return compact_table(table_name, state)
+    _cache_table(table_name, state)
+    _save_stats(table_name, state)
+    return True
+
+@timed("write")
+def insert_table_rows(table_name, rows, table_meta=None):
+    """
+    Добавляет в таблицу много записей одной операцией записи.
+    Небольшая пачка дописывается в журнал одним блоком; пачка, сравнимая
+    с размером таблицы, сразу уплотняется в новый снимок, а индексы
+    строятся заново вместо поштучной вставки.
+    """
+    with table_lock(table_name, exclusive=True):
+        return _insert_table_rows(table_name, rows, table_meta)
+
+def _insert_table_rows(table_name, rows, table_meta):
+    state = load_table(table_name, table_meta)
+    threshold = max(
+        config.LOG_COMPACT_MIN_ENTRIES, len(state["rows"]) * config.LOG_COMPACT_RATIO
+    )
+    # Внутри транзакции снимок не переписывается до фиксации
+    if len(rows) <= threshold or _transaction is not None:
+        return write_table_changes(
+            table_name, [{"op": "insert", "row": to_dict(row)} for row in rows]
+        )
+
+    table_rows = state["rows"]
+    records = _to_records(rows, state.get("record"))
+    for row in records:
+        table_rows[row["ID"]] = row
+    if state.get("stats") is not None:
+        add_rows(state["stats"], records)
+    if rows:
+        state["next_id"] = max(state["next_id"], rows[-1]["ID"] + 1)
+    if state.get("segment_rows"):
+        segment_rows = state["segment_rows"]
+        state["dirty_segments"].update(
+            segment_of(row["ID"], segment_rows) for row in rows
+        )
+    for column in list(state["indexes"]):
+        state["indexes"][column] = ColumnIndex.build(column, table_rows.values())
+    return compact_table(table_name, state)
+
+def _read_table_meta(table_name):
+    """Сохраненные уплотнением счетчик ID и статистика сегментов таблицы"""
+    filepath = table_meta_path(table_name)
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            count("bytes_read", os.fstat(f.fileno()).st_size)
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError:
+        raise StorageError(f"файл {os.path.basename(filepath)} поврежден") from None
+
+def _with_table_meta(table_name, table_meta):
+    """
+    Описание таблицы из метаданных, дополненное счетчиком ID и статистикой
+    сегментов из data/<таблица>.meta. Читается под блокировкой таблицы.
+    """
+    stored = _read_table_meta(table_name)
+    if not stored:
+        return table_meta
+    merged = dict(table_meta)
+    merged["next_id"] = max(table_meta.get("next_id", 1), stored.get("next_id", 1))
+    merged["segments"] = {
+        **table_meta.get("segments", {}),
+        **stored.get("segments", {}),
+    }
+    return merged
+
+def table_segment_stats(table_name, table_meta):
+    """Статистика сегментов таблицы: {номер: статистика}"""
+    with table_lock(table_name):
+        return _with_table_meta(table_name, table_meta).get("segments", {})
+
+def _save_table_meta(table_name, next_id, segments=None):
+    """
+    Сохраняет счетчик ID таблицы и статистику переписываемых сегментов
+    ({номер: статистика}). Нужен при уплотнении: после него журнал больше
+    не хранит вставки удаленных записей.
+    Пишется в data/<таблица>.meta, а не в db_meta.json: уплотнение идет под
+    блокировкой таблицы, а команды схемы берут блокировку метаданных раньше
+    блокировки таблицы, и обратный порядок приводил бы к взаимному ожиданию.
+    """
+    stored = _read_table_meta(table_name)
+    changed = stored.get("next_id") != next_id
+    stored["next_id"] = next_id
+    if segments:
+        saved = stored.setdefault("segments", {})
+        for number, stats in segments.items():
+            saved[str(number)] = stats
+        changed = True
+    if changed:
+        atomic_write(
+            table_meta_path(table_name), json.dumps(stored, ensure_ascii=False)
+        )
+
+@timed("compact")
+def compact_table(table_name, state=None, table_meta=None):
+    """
+    Переписывает снимок таблицы, очищает журнал изменений
+    и сохраняет индексы, построенные по новому снимку.
+    """
+    with table_lock(table_name, exclusive=True):
+        return _compact_table(table_name, state, table_meta)
+
+def _compact_table(table_name, state, table_meta):
+    if state is None:
+        state = load_table(table_name, table_meta)
+
+    storage = state["storage"]
+    segment_rows = state.get("segment_rows")
+    if segment_rows:
+        # Переписываются только сегменты, измененные после прошлого уплотнения.
+        # Статистика сохраняется раньше файлов: пока журнал не удален,
+        # сегменты с изменениями из журнала все равно читаются при запросе.
+        groups = _segment_groups(state)
+        columns = list(state["columns"] or {})
+        _save_table_meta(table_name, state["next_id"], {
+            number: segment_stats(rows, columns) for number, rows in groups.items()
+        })
+        if not _write_segments(table_name, groups, storage, state["columns"]):
+            return False
+        state["dirty_segments"] = set()
+    else:
+        _save_table_meta(table_name, state["next_id"])
+        rows = list(state["rows"].values())
+        if not _write_snapshot(table_name, rows, storage, state["columns"]):
+            return False
+
+    state["snapshot_rows"] = len(state["rows"])
+    signature = _snapshot_signature(table_name, storage, segment_rows)
+    for index in state["indexes"].values():
+        save_index(table_name, index, signature)
+    _cache_table(table_name, state)
+    _save_stats(table_name, state)
+    return True
+
+def _segment_groups(state):
+    """Записи измененных сегментов: {номер: записи в порядке ID}"""
+    segment_rows = state["segment_rows"]
+    groups = {number: [] for number in sorted(state["dirty_segments"])}
+    for row_id, row in state["rows"].items():
+        group = groups.get(segment_of(row_id, segment_rows))
+        if group is not None:
+            group.append(row)
+    return groups
+
+def create_table_index(table_name, column, table_meta=None):
+    """Строит индекс по столбцу и сохраняет его вместе со снимком таблицы"""
+    state = load_table(table_name, table_meta)
+    state["indexes"][column] = ColumnIndex.build(column, state["rows"].values())
+    return compact_table(table_name, state)
+
+def convert_table_storage(table_name, table_meta, storage):
+    """Переводит снимок таблицы в другой формат хранения"""
+    state = load_table(table_name, table_meta)
+    old_storage = state["storage"]
+    state["storage"] = storage
+    if state["columns"] is None:
+        state["columns"] = table_meta["columns"]
+    _mark_all_segments(table_name, state, old_storage)
+    if not compact_table(table_name, state):
+        state["storage"] = old_storage
+        return False
+
+    if old_storage != storage:
+        old_files = [table_path(table_name, old_storage)] + [
+            segment_path(table_name, number, old_storage)
+            for number in segment_numbers(table_name, old_storage)
+        ]
+        for filepath in old_files:
+            try:
+                os.remove(filepath)
+            except FileNotFoundError:
+                pass
+    return True
+
+def remove_table_data(table_name):
+    """Удаляет файлы данных и индексы таблицы"""
+    snapshots = [table_path(table_name, storage) for storage in SNAPSHOT_EXTENSIONS]
+    with table_lock(table_name, exclusive=True):
+        extra = [
+            log_path(table_name),
+            stats_path(table_name),
+            table_meta_path(table_name),
+        ]
+        for filepath in snapshots + extra:
+            try:
+                os.remove(filepath)
+            except FileNotFoundError:
+                pass
+        shutil.rmtree(os.path.join(DATA_DIR, table_name), ignore_errors=True)
+        remove_indexes(table_name)
+    _log_entries.pop(table_name, None)
+    _table_cache.pop(table_name, None)
+
+
+# ========== ТРАНЗАКЦИИ ==========
+
+def journal_path():
+    """Путь к журналу фиксации транзакций текущего процесса"""
+    return os.path.join(DATA_DIR, f"commit-{os.getpid()}.journal")
+
+def in_transaction():
+    """Открыта ли транзакция"""
+    return _transaction is not None
+
+def begin_transaction():
+    """
+    Открывает транзакцию. До фиксации изменения таблиц и метаданных
+    копятся в памяти, а файлы на диске не меняются.
+    """
+    global _transaction
+    if _transaction is not None:
+        return False
+    _transaction = {"tables": {}, "metadata": {}, "locks": []}
+    return True
+
+def _hold_lock(path):
+    """Берет исключительную блокировку до конца транзакции"""
+    acquire(path, exclusive=True)
+    _transaction["locks"].append(path)
+
+def _release_locks(transaction):
+    """Снимает блокировки, взятые транзакцией"""
+    for path in transaction["locks"]:
+        release(path)
+
+def rollback_transaction():
+    """Отменяет транзакцию: состояние таблиц будет заново прочитано с диска"""
+    global _transaction
+    if _transaction is None:
+        return False
+    for table_name in _transaction["tables"]:
+        _table_cache.pop(table_name, None)
+    _metadata_cache.clear()
+    _release_locks(_transaction)
+    _transaction = None
+    return True
+
+def _apply_journal(journal):
+    """
+    Переносит изменения из журнала фиксации в файлы.
+    Журнал каждой таблицы сначала обрезается до длины, которую он имел
+    до фиксации, поэтому повторное применение не дублирует записи.
+    """
+    for table_name, change in journal["tables"].items():
+        durable_append(
+            log_path(table_name), _log_payload(change["entries"]), change["offset"]
+        )
+    for filepath, data in journal["metadata"].items():
+        atomic_write(filepath, json.dumps(data, ensure_ascii=False, indent=2))
+        _metadata_cache[filepath] = (_file_signature(filepath), data)
+
+@timed("write")
+def commit_transaction():
+    """
+    Фиксирует транзакцию.
+    Все изменения сначала атомарно записываются в журнал фиксации, затем
+    дописываются в журналы таблиц и метаданные - по одному fsync на файл
+    на всю транзакцию. Если сбой прервет перенос, он будет завершен
+    по журналу фиксации при следующем запуске (recover_transaction).
+    """
+    global _transaction
+    transaction = _transaction
+    if transaction is None:
+        return False
+
+    journal = {
+        "tables": {
+            table_name: {"offset": line_end(log_path(table_name)), "entries": entries}
+            for table_name, entries in transaction["tables"].items()
+            if entries
+        },
+        "metadata": transaction["metadata"],
+    }
+    if journal["tables"] or journal["metadata"]:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        try:
+            atomic_write(journal_path(), json.dumps(journal, ensure_ascii=False))
+        except Exception as e:
+            print(f"Ошибка при фиксации транзакции: {e}")
+            return False
+
+        _transaction = None
+        try:
+            _apply_journal(journal)
+        except Exception as e:
+            for table_name in transaction["tables"]:
+                _table_cache.pop(table_name, None)
+            _metadata_cache.clear()
+            _release_locks(transaction)
+            print(f"Ошибка при фиксации транзакции: {e}")
+            print("Изменения будут применены при следующем запуске.")
+            return False
+        os.remove(journal_path())
+        fsync_directory(DATA_DIR)
+
+    _transaction = None
+    try:
+        for table_name, entries in transaction["tables"].items():
+            state = _table_cache.get(table_name)
+            if state is not None:
+                _log_written(table_name, state, len(entries))
+    finally:
+        _release_locks(transaction)
+    return True
+
+def recover_transaction():
+    """
+    Завершает фиксации, прерванные сбоем.
+    Журнал фиксации обрабатывается под блокировками всех его таблиц:
+    если фиксацию еще выполняет живой процесс, восстановление дождется
+    ее окончания и увидит, что журнал уже удален.
+    Возвращает True, если были применены изменения хотя бы из одного журнала.
+    """
+    recovered = False
+    for filepath in sorted(glob.glob(os.path.join(DATA_DIR, JOURNAL_PATTERN))):
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                journal = json.load(f)
+        except FileNotFoundError:
+            continue
+        except json.JSONDecodeError:
+            name = os.path.basename(filepath)
+            raise StorageError(f"журнал фиксации {name} поврежден") from None
+
+        paths = [table_lock_path(table) for table in sorted(journal["tables"])]
+        paths += [metadata_lock_path(path) for path in sorted(journal["metadata"])]
+        for path in paths:
+            acquire(path, exclusive=True)
+        try:
+            if not os.path.exists(filepath):
+                continue
+            _apply_journal(journal)
+            os.remove(filepath)
+            fsync_directory(DATA_DIR)
+            recovered = True
+        finally:
+            for path in paths:
+                release(path)
+
+    if recovered:
+        clear_cache()
+    return recovered
@@ -0,0 +1,258 @@
+"""
+Разбор и компиляция условий WHERE.
+
+Поддерживаются сравнения =, !=, <>, <, <=, >, >=, связки AND/OR и скобки:
+    age >= 18 and (name = "Bob" or is_active = true)
+
+Условие разбирается в дерево из кортежей:
+    ("cmp", столбец, оператор, значение)
+    ("and", [узлы]) / ("or", [узлы])
+и один раз на запрос компилируется в функцию record -> bool.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+Token = namedtuple("Token", ["kind", "value", "start"])
+
+
+class _Parameter:
+    """Место параметра ? в подготовленной команде (prepare)"""
+
+    def __repr__(self):
+        return "?"
+
+
+PARAMETER = _Parameter()
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<space>\s+)
+    |(?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    |(?P<op><=|>=|!=|<>|=|<|>)
+    |(?P<punct>[(),])
+    |(?P<word>[^\s()=<>!,"']+)
+    """,
+    re.VERBOSE,
+)
+
+# Операторы сравнения и их запись в Python
+COMPARISONS = {
+    "=": "==",
+    "!=": "!=",
+    "<>": "!=",
+    "<": "<",
+    "<=": "<=",
+    ">": ">",
+    ">=": ">=",
+}
+
+
+def tokenize(text):
+    """
+    Разбивает текст на лексемы с учетом кавычек.
+    Возвращает (список Token, ошибка).
+    """
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if match is None:
+            return None, (
+                f'Неожиданный символ "{text[position]}" в позиции {position + 1}'
+            )
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        if kind != "space":
+            tokens.append(Token(kind, value, position))
+        position = match.end()
+    return tokens, None
+
+def is_keyword(token, *words):
+    """Проверяет, является ли лексема одним из ключевых слов"""
+    return token.kind == "word" and token.value.lower() in words
+
+def parse_literal(token):
+    """Преобразует лексему значения в int, bool или str"""
+    if token.kind == "string":
+        return token.value
+
+    value = token.value
+    if value == "?":
+        return PARAMETER
+    if value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    if value.isdigit() or (value[0] == '-' and value[1:].isdigit()):
+        return int(value)
+    return value
+
+def parse_condition(tokens, position=0):
+    """
+    Разбирает условие, начиная с лексемы position.
+    Останавливается на первой лексеме, которая не может продолжить условие.
+    Возвращает (дерево условия, позиция следующей лексемы, ошибка).
+    """
+    try:
+        node, position = _parse_or(tokens, position)
+    except ValueError as e:
+        return None, position, str(e)
+    return node, position, None
+
+def _parse_or(tokens, position):
+    children = []
+    while True:
+        node, position = _parse_and(tokens, position)
+        children.append(node)
+        if position < len(tokens) and is_keyword(tokens[position], "or"):
+            position += 1
+            continue
+        break
+    return (children[0] if len(children) == 1 else ("or", children)), position
+
+def _parse_and(tokens, position):
+    children = []
+    while True:
+        node, position = _parse_primary(tokens, position)
+        children.append(node)
+        if position < len(tokens) and is_keyword(tokens[position], "and"):
+            position += 1
+            continue
+        break
+    return (children[0] if len(children) == 1 else ("and", children)), position
+
+def _parse_primary(tokens, position):
+    if position >= len(tokens):
+        raise ValueError("Условие WHERE оборвано")
+
+    token = tokens[position]
+    if token.kind == "punct" and token.value == "(":
+        node, position = _parse_or(tokens, position + 1)
+        closing = tokens[position] if position < len(tokens) else None
+        if closing is None or closing.kind != "punct" or closing.value != ")":
+            raise ValueError("Не закрыта скобка в условии WHERE")
+        return node, position + 1
+
+    if token.kind not in ("word", "string"):
+        raise ValueError(f'Ожидается столбец, получено "{token.value}"')
+
+    operator = tokens[position + 1] if position + 1 < len(tokens) else None
+    if operator is None or operator.kind != "op":
+        raise ValueError(
+            'Неверный формат условия WHERE. Ожидается: "столбец <оператор> значение"'
+        )
+
+    if position + 2 >= len(tokens):
+        raise ValueError(f'Нет значения после "{token.value} {operator.value}"')
+    value = tokens[position + 2]
+    if value.kind not in ("word", "string"):
+        raise ValueError(f'Ожидается значение, получено "{value.value}"')
+
+    return ("cmp", token.value, operator.value, parse_literal(value)), position + 3
+
+def from_dict(where_clause):
+    """Строит условие из словаря {столбец: значение} (равенство по всем столбцам)"""
+    nodes = [("cmp", column, "=", value) for column, value in where_clause.items()]
+    if len(nodes) == 1:
+        return nodes[0]
+    return ("and", nodes)
+
+def conjuncts(node):
+    """Сравнения, которые обязаны выполняться одновременно (верхний уровень AND)"""
+    if node[0] == "cmp":
+        return [node]
+    if node[0] == "and":
+        return [child for child in node[1] if child[0] == "cmp"]
+    return []
+
+def map_values(node, convert):
+    """
+    Применяет convert(столбец, значение) ко всем значениям условия.
+    Возвращает новое дерево.
+    """
+    if node[0] == "cmp":
+        _, column, operator, value = node
+        return ("cmp", column, operator, convert(column, value))
+    return (node[0], [map_values(child, convert) for child in node[1]])
+
+def map_columns(node, rename):
+    """Дерево условия, в котором каждый столбец заменен на rename(столбец)"""
+    if node[0] == "cmp":
+        _, column, operator, value = node
+        return ("cmp", rename(column), operator, value)
+    return (node[0], [map_columns(child, rename) for child in node[1]])
+
+def columns_of(node):
+    """Множество столбцов, упомянутых в условии"""
+    if node[0] == "cmp":
+        return {node[1]}
+    return set().union(*(columns_of(child) for child in node[1]))
+
+def may_match(node, minimums, maximums):
+    """
+    Проверяет по минимумам и максимумам столбцов, может ли хоть одна
+    запись удовлетворять условию. False означает, что подходящих записей
+    точно нет; True - что они возможны.
+    """
+    if node[0] == "and":
+        return all(may_match(child, minimums, maximums) for child in node[1])
+    if node[0] == "or":
+        return any(may_match(child, minimums, maximums) for child in node[1])
+
+    _, column, operator, value = node
+    if column not in minimums or column not in maximums:
+        return True
+    low, high = minimums[column], maximums[column]
+    try:
+        if operator == "=":
+            return low <= value <= high
+        if operator in ("!=", "<>"):
+            return not (low == high == value)
+        if operator == "<":
+            return low < value
+        if operator == "<=":
+            return low <= value
+        if operator == ">":
+            return high > value
+        if operator == ">=":
+            return high >= value
+    except TypeError:
+        pass
+    return True
+
+def _to_source(node, constants, slots=None):
+    """Переводит дерево условия в выражение Python"""
+    if node[0] == "cmp":
+        _, column, operator, value = node
+        name = f"_v{len(constants)}"
+        constants[name] = value
+        if slots is not None:
+            return f"(record.{slots[column]} {COMPARISONS[operator]} {name})"
+        return f"(record[{column!r}] {COMPARISONS[operator]} {name})"
+    joiner = " and " if node[0] == "and" else " or "
+    return "(" + joiner.join(
+        _to_source(child, constants, slots) for child in node[1]
+    ) + ")"
+
+@lru_cache(maxsize=256)
+def _compile_source(source, names):
+    """
+    Компилирует выражение в фабрику: значения сравнений -> функция проверки.
+    Условия одного вида с разными значениями компилируются один раз.
+    """
+    code = f"lambda {', '.join(names)}: lambda record: {source}"
+    return eval(code, {"__builtins__": {}})
+
+def compile_condition(node, record=None):
+    """
+    Компилирует условие в функцию record -> bool.
+    Дерево обходится один раз, после чего проверка записи - это один
+    вызов скомпилированного выражения без разбора условия.
+    record - класс записей (records.Record): тогда функция читает значения
+    прямо из слотов и годится только для записей этого класса.
+    """
+    constants = {}
+    slots = record.slots if record is not None else None
+    source = _to_source(node, constants, slots)
+    return _compile_source(source, tuple(constants))(*constants.values())
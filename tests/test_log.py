@@ -0,0 +1,51 @@
+"""Журнал изменений таблицы после сбоя во время дозаписи"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def run(directory, *commands):
+    """Выполняет команды в отдельном процессе, как при новом запуске"""
+    args = [sys.executable, "-m", "primitive_db.main"]
+    for command in commands:
+        args += ["-c", command]
+    env = dict(os.environ, PYTHONPATH=SRC)
+    result = subprocess.run(
+        args, cwd=directory, env=env, capture_output=True, text=True, check=True
+    )
+    return result.stdout
+
+
+class TornLogTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+        run(self.directory, "create_table t a:int", "insert into t values (1)")
+        self.log = os.path.join(self.directory, "data", "t.log")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def tear(self, text):
+        with open(self.log, "a", encoding="utf-8") as f:
+            f.write(text)
+
+    def test_insert_after_torn_line_survives_restart(self):
+        self.tear('{"op": "insert", "row": {"ID": 2, "a"')
+        run(self.directory, "insert into t values (3)")
+        output = run(self.directory, "select from t", "insert into t values (4)")
+        self.assertIn("| 2  | 3 |", output)
+        self.assertIn("ID=3", output)
+
+    def test_commit_after_torn_line_survives_restart(self):
+        self.tear('{"op": "ins')
+        run(self.directory, "begin", "insert into t values (5)", "commit")
+        self.assertIn("| 2  | 5 |", run(self.directory, "select from t"))
+
+
+if __name__ == "__main__":
+    unittest.main()